@@ -0,0 +1,144 @@
+import os, sys, time, argparse, multiprocessing, traceback
+from Statistics import N_BOOT
+
+
+def run(title, name, analyze, plot, split, sweep=None, series=None):
+    #analyze(progress, n_boot) returns a dict of result tables, plot(tables) builds matplotlib figures from them,
+    #split(tables) divides the tables into (key, tables) parts, which are rendered independently,
+    #sweep(progress, n_boot, quantity_processes) returns tables of the regressions over a grid of parameters,
+    #series(progress, n_boot) is analyze over all available months, its tables are plotted by the same plot and split
+    parser = argparse.ArgumentParser(description=title)
+    parser.add_argument('--batch', action='store_true', help='analyze without the window, write figures and tables to files')
+    parser.add_argument('--output', default='.', help='folder for figures and tables of the batch mode')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg'], help='formats of figures of the batch mode')
+    parser.add_argument('--n-boot', type=int, default=N_BOOT, help='resamples of confidence intervals, 0 computes no intervals')
+    parser.add_argument('--processes', type=int, default=None, help='processes rendering figures or sweeping, all processors by default')
+    if sweep is not None:
+        parser.add_argument('--sweep', action='store_true', help='write the regressions over the grid of parameters instead of the analysis')
+    if series is not None:
+        parser.add_argument('--series', action='store_true', help='analyze all available months with rolling regressions')
+    arguments = parser.parse_args()
+
+    if series is not None and arguments.series:
+        analyze, name = series, name + '_series'
+    if sweep is not None and arguments.sweep:
+        run_sweep(name, sweep, arguments.output, arguments.n_boot, arguments.processes)
+    elif arguments.batch:
+        run_batch(name, analyze, plot, split, arguments.output, arguments.format, arguments.n_boot, arguments.processes)
+    else:
+        sys.exit(run_window(title, analyze, plot, arguments.n_boot))
+
+
+def run_batch(name, analyze, plot, split, folder, formats=('png',), n_boot=N_BOOT, quantity_processes=None):
+    tables = analyze(print, n_boot)
+    os.makedirs(folder, exist_ok=True)
+    for table_name, table in tables.items():
+        table.to_csv(os.path.join(folder, name + '_' + table_name + '.csv'), index=False)
+
+    render(name, plot, split(tables), folder, formats, quantity_processes)
+    print('Operation successfully completed!')
+
+
+def run_sweep(name, sweep, folder, n_boot=N_BOOT, quantity_processes=None):
+    tables = sweep(print, n_boot, quantity_processes)
+    os.makedirs(folder, exist_ok=True)
+    for table_name, table in tables.items():
+        table.to_csv(os.path.join(folder, name + '_' + table_name + '.csv'), index=False)
+    print('Operation successfully completed!')
+
+
+def render(name, plot, parts, folder, formats=('png',), quantity_processes=None):
+    #every part is drawn by the Agg backend in its own process
+    start = time.perf_counter()
+    tasks = [(plot, part, os.path.join(folder, name + '_' + str(key)), formats) for key, part in parts]
+    files = []
+    processor_time = 0
+    with multiprocessing.Pool(quantity_processes) as pool:
+        for part_files, duration in pool.imap_unordered(_render_part, tasks):
+            files.extend(part_files)
+            processor_time += duration
+    duration = time.perf_counter() - start
+    print('Rendered ' + str(len(files)) + ' files in ' + str(round(duration, 1)) + ' s, ' + str(round(processor_time, 1)) + ' s of processor time')
+    return files
+
+
+def _render_part(task):
+    plot, part, base_name, formats = task
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+
+    plot(part)
+    numbers = plt.get_fignums()
+    files = []
+    for number in numbers:
+        figure_name = base_name if len(numbers) == 1 else base_name + '_' + str(number)
+        for extension in formats:
+            files.append(figure_name + '.' + extension)
+            plt.figure(number).savefig(files[-1])
+    plt.close('all')
+    return files, time.perf_counter() - start
+
+
+def run_window(title, analyze, plot, n_boot=N_BOOT):
+    from PyQt5 import QtCore, QtGui, QtWidgets
+    from matplotlib import pyplot as plt
+
+    class Worker(QtCore.QThread):
+        #analysis runs outside of the GUI thread, the figures are built in it after the end
+        progress = QtCore.pyqtSignal(str)
+        completed = QtCore.pyqtSignal(object)
+        failed = QtCore.pyqtSignal(str)
+
+        def run(self):
+            try:
+                self.completed.emit(analyze(self.progress.emit, n_boot))
+            except Exception as error:
+                #the traceback goes to the console as an uncaught exception would, the window shows the message
+                traceback.print_exc()
+                self.failed.emit(str(error))
+
+    def start():
+        button.setEnabled(False)
+        status.setText('Analysis is started...')
+        worker.start()
+
+    def show_results(tables):
+        plot(tables)
+        plt.show(block=False)
+        status.setText('Operation successfully completed!')
+        button.setEnabled(True)
+
+    def show_error(error):
+        status.setText('Error: ' + error)
+        button.setEnabled(True)
+
+    app = QtWidgets.QApplication(sys.argv)
+    window = QtWidgets.QWidget()
+    window.resize(600, 100)
+
+    label = QtWidgets.QLabel()
+    label.setText(title)
+
+    myFont=QtGui.QFont()
+    myFont.setPointSize(14)
+    myFont.setBold(True)
+    label.setFont(myFont)
+
+    button = QtWidgets.QCommandLinkButton("Analyze")
+    status = QtWidgets.QLabel()
+
+    worker = Worker(window)
+    worker.progress.connect(status.setText)
+    worker.completed.connect(show_results)
+    worker.failed.connect(show_error)
+    button.clicked.connect(start)
+
+    vbox = QtWidgets.QVBoxLayout()
+    vbox.addWidget(label)
+    vbox.addWidget(button)
+    vbox.addWidget(status)
+    window.setLayout(vbox)
+    window.show()
+    return app.exec_()
@@ -0,0 +1,588 @@
+import sys, glob, time, datetime, subprocess, tracemalloc, tempfile
+import numpy as np
+import pandas as pd
+import Vaccined
+import VaccinedUSA
+import ExcessMortality
+from Regions import ROSSTAT_REGIONS
+from Months import add_months
+import Statistics
+import Sweep
+from Cache import FileCache
+
+
+def load_saved_pages(folder=Vaccined.FOLDER + 'pages/'):
+    pages = []
+    for file_name in sorted(glob.glob(folder + '*.html')):
+        with open(file_name, encoding='utf-8') as file:
+            pages.append((file_name, file.read()))
+    return pages
+
+
+def load_saved_tables(folder=Vaccined.FOLDER + 'pages/'):
+    parser = Vaccined.get_table_parser()
+    tables = []
+    for file_name, page in load_saved_pages(folder):
+        try:
+            tables.append((file_name, parser.parse(page)))
+        except RuntimeError:
+            #not a region page
+            continue
+    return tables
+
+
+def decode_dates_by_rows(date_strings, today):
+    #the former get_date_int of Vaccined.VaccinationData._get_region_data, as it was
+    def get_date_int(date_str, prev_date, year):
+        pos = date_str.find(' ')
+        day = int(date_str[:pos])
+        
+        current_date = 10000 * year
+        if date_str.find('декабря') >= 0:
+            current_date += 100 * 12
+        elif date_str.find('ноября') >= 0:
+            current_date += 100 * 11
+        elif date_str.find('октября') >= 0:
+            current_date += 100 * 10
+        elif date_str.find('сентября') >= 0:
+            current_date += 100 * 9
+        elif date_str.find('августа') >= 0:
+            current_date += 100 * 8
+        elif date_str.find('июля') >= 0:
+            current_date += 100 * 7
+        elif date_str.find('июня') >= 0:
+            current_date += 100 * 6
+        elif date_str.find('мая') >= 0:
+            current_date += 100 * 5
+        elif date_str.find('апреля') >= 0:
+            current_date += 100 * 4
+        elif date_str.find('марта') >= 0:
+            current_date += 100 * 3
+        elif date_str.find('февраля') >= 0:
+            current_date += 100 * 2
+        elif date_str.find('января') >= 0:
+            current_date += 100 * 1
+        else:
+            raise RuntimeError("Couldn't recognize the date: " + date_str + ' !')
+        
+        current_date += day
+        if current_date > prev_date:
+            #year has changed
+            current_date -= 10000
+            year -= 1
+        return current_date, year
+    
+    dates = []
+    prev_date = int(today.strftime('%Y%m%d'))
+    year = today.year
+    for date_str in date_strings:
+        current_date, year = get_date_int(date_str, prev_date, year)
+        dates.append(current_date)
+        prev_date = current_date
+    return np.array(dates, dtype='int32')
+
+
+def clear_duplicated_values_by_rows(region_data):
+    #the former row by row Vaccined.VaccinationData._clear_duplicated_values
+    for column in ('Vaccinated', 'FullyVaccinated', 'Revaccinated'):
+        prev_value = None
+        for index in reversed(region_data.index):
+            value = region_data.loc[index][column]
+            if prev_value is not None and value == prev_value:
+                region_data.loc[index, column] = 0
+            prev_value = value
+    return region_data
+
+
+def delete_empty_rows_by_rows(region_data):
+    #the former row by row Vaccined.VaccinationData._delete_empty_rows
+    empty_rows = []
+    for index in region_data.index:
+        row = region_data.loc[index]
+        if row.Vaccinated + row.FullyVaccinated + row.Revaccinated == 0:
+            empty_rows.append(index)
+    region_data = region_data.drop(empty_rows, axis=0)
+    return region_data.reset_index(drop=True)
+
+
+def read_mortality_by_rows(reader):
+    #the former Vaccined.MortalityReader.read with the row by row filter
+    names = ['Region', 'Mortality_2021', 'Mortality_2020']
+    data = pd.read_csv(reader.file_name, sep=';', header=0, names=names, usecols=[0, 5, 6])
+    data = data[data.Mortality_2020 > reader.death_significance_limit]
+    
+    bad_rows = []
+    for index in data.index:
+        region = data.loc[index].Region
+        if region.startswith(' ') or region.find('без автономии') >= 0:
+            bad_rows.append(index)
+    data = data.drop(bad_rows, axis=0)
+    
+    data['Region'] = Vaccined.RUSSIAN_REGIONS.replace(data.Region)
+    data['Date'] = reader.month_date
+    data['K_mortality'] = data.Mortality_2021 / data.Mortality_2020
+    return data.drop(['Mortality_2021', 'Mortality_2020'], axis=1).reset_index(drop=True)
+
+
+def read_population_by_rows(file_name=Vaccined.FOLDER + 'Popul2021_Site-1.csv'):
+    #the former Vaccined.Analyzator._get_population with the row by row filter
+    data = pd.read_csv(file_name, sep=';', header=0, names=['Region', 'Population'], usecols=(0,1))
+    removed_rows = []
+    for index in data.index:
+        if data.loc[index].Region.find(' округ') >= 0:
+            removed_rows.append(index)
+    data = data.drop(removed_rows, axis=0)
+    
+    data = data.sort_values(by='Population', ascending=False)
+    data = data.reset_index(drop=True)
+    data['Region'] = Vaccined.RUSSIAN_REGIONS.replace(data.Region)
+    return data
+
+
+def compare_mortality_readers():
+    readers = [Vaccined.MortalityReader(month) for month in Vaccined.get_available_months()]
+    analyzator = Vaccined.Analyzator.__new__(Vaccined.Analyzator)
+    population_name = Vaccined.FOLDER + 'Popul2021_Site-1.csv'
+    
+    start = time.perf_counter()
+    by_rows = [read_mortality_by_rows(reader) for reader in readers]
+    population_by_rows = read_population_by_rows(population_name)
+    print('rows: ' + str(len(readers) + 1) + ' files in ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    with tempfile.TemporaryDirectory() as folder:
+        cache = FileCache(folder, Vaccined.PARSER_VERSION)
+        analyzator.file_cache = cache
+        for reader in readers:
+            reader.cache = cache
+        
+        start = time.perf_counter()
+        vectorized = [reader.read() for reader in readers]
+        population = analyzator._get_population()
+        print('vectorized and saved: ' + str(len(readers) + 1) + ' files in ' + str(round(time.perf_counter() - start, 3)) + ' s')
+        
+        start = time.perf_counter()
+        cached = [reader.read() for reader in readers]
+        population_cached = analyzator._get_population()
+        print('cached: ' + str(len(readers) + 1) + ' files in ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    for first, second, third in zip(by_rows, vectorized, cached):
+        pd.testing.assert_frame_equal(first[['Region', 'Date', 'K_mortality']], second)
+        pd.testing.assert_frame_equal(second, third)
+    pd.testing.assert_frame_equal(population_by_rows, population, check_dtype=False)
+    pd.testing.assert_frame_equal(population, population_cached)
+    print('Mortality readers give identical tables')
+
+
+def get_synthetic_region(quantity_days=1000, seed=0):
+    #cumulative counters from new to old days, which often stay the same for several days
+    generator = np.random.default_rng(seed)
+    region_data = {'Date': np.arange(quantity_days, 0, -1, dtype='int32')}
+    for column in ('Vaccinated', 'FullyVaccinated', 'Revaccinated'):
+        increments = generator.integers(0, 1000, quantity_days) * (generator.random(quantity_days) < 0.5)
+        region_data[column] = np.cumsum(increments[::-1])[::-1].astype('uint32')
+    return pd.DataFrame(region_data)
+
+
+def compare_row_cleaners(quantity_regions=10, quantity_days=1000):
+    #timing only, the equality of the cleaners is tested by test_Vaccined.py
+    regions = [get_synthetic_region(quantity_days, seed) for seed in range(quantity_regions)]
+    downloader = Vaccined.VaccinationData.__new__(Vaccined.VaccinationData)
+    
+    start = time.perf_counter()
+    by_rows = [delete_empty_rows_by_rows(clear_duplicated_values_by_rows(region.copy())) for region in regions]
+    print('rows: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    start = time.perf_counter()
+    vectorized = []
+    for region in regions:
+        region_data = downloader._clear_duplicated_values(region.copy())
+        vectorized.append(downloader._delete_empty_rows(region_data))
+    print('vectorized: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+
+
+def interpolate_by_regions(store, column, border_date):
+    #the former region by region Vaccined.Analyzator._get_vaccination_for_month, without rejecting corrections
+    def get_date(date_int):
+        date_str = str(date_int)
+        date_str = date_str[:4] + '-' + date_str[4:6] + '-' + date_str[6:]
+        return np.datetime64(date_str, 'D')
+        
+    vaccination = {}
+    for region in store.regions:
+        dates = store.get(region, 'Date')
+        values = store.get(region, column)
+        positive = values > 0
+        dates = dates[positive]
+        values = values[positive].astype('int64')
+        if len(dates) < 2:
+            continue
+        
+        if border_date > dates[-1]:
+            first_pos = -1
+            second_pos = -2
+        elif border_date < dates[0]:
+            first_pos = 1
+            second_pos = 0
+        else:
+            first_pos = np.searchsorted(dates, border_date, side='left')
+            second_pos = np.searchsorted(dates, border_date, side='right') - 1
+        
+        first_date, first_value = dates[first_pos], values[first_pos]
+        second_date, second_value = dates[second_pos], values[second_pos]
+        
+        part = None
+        derivative_period = np.busday_count(get_date(second_date), get_date(first_date))
+        shift_period = np.busday_count(get_date(second_date), get_date(border_date))
+        if derivative_period == 0 or shift_period == 0:
+            value = second_value
+        else:
+            derivative = (first_value - second_value) / derivative_period
+            value = second_value + derivative * shift_period
+            delta_first = first_value - value 
+            delta_second = value - second_value
+            if abs(delta_first) < abs(delta_second):
+                part = delta_first / first_value
+            else:
+                part = delta_second / second_value
+                
+        vaccination[region] = (np.uint32(max(value, 0)), part)
+    return vaccination
+
+
+def compare_interpolators(border_dates=range(20210601, 20210631)):
+    downloader = Vaccined.VaccinationData()
+    store = Vaccined.VaccinationStore.read(downloader.file_name, downloader.table_name)
+    for column in ('Vaccinated', 'FullyVaccinated'):
+        start = time.perf_counter()
+        by_regions = {border_date: interpolate_by_regions(store, column, border_date) for border_date in border_dates}
+        print(column + ', regions: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+        
+        start = time.perf_counter()
+        interpolator = Vaccined.VaccinationInterpolator(store, column)
+        batched = interpolator.interpolate(list(border_dates))
+        print(column + ', batched: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+        
+        for region, border_date, value, correction in zip(batched.Region, batched.Date, batched[column], batched.Correction):
+            expected_value, expected_correction = by_regions[border_date][region]
+            if expected_correction is None:
+                same = value == expected_value and np.isnan(correction)
+            else:
+                same = value == expected_value and np.isclose(correction, expected_correction)
+            if not same:
+                raise RuntimeError('Interpolators give different values for ' + region + ' at ' + str(border_date) + ' !')
+        if len(batched) != sum(len(vaccination) for vaccination in by_regions.values()):
+            raise RuntimeError('Interpolators give different regions!')
+    print('Interpolators give identical values')
+
+
+def read_excel_by_cells(file_name):
+    #the former cell by cell readers of ExcessMortality.Excel
+    excel = ExcessMortality.Excel(file_name)
+    if file_name.endswith('xls'):
+        import xlrd
+        sheet = xlrd.open_workbook(file_name).sheet_by_name('t1_1')
+        rows = ([sheet.cell(row, ExcessMortality.COLUMN_REGION).value, sheet.cell(row, ExcessMortality.COLUMN_MORTALITY).value]
+                for row in range(ExcessMortality.FIRST_ROW, sheet.nrows))
+    else:
+        from openpyxl import load_workbook
+        sheet = load_workbook(filename=file_name, read_only=True)['t1_1']
+        rows = ([row[ExcessMortality.COLUMN_REGION].value, row[ExcessMortality.COLUMN_MORTALITY].value]
+                for index, row in enumerate(sheet.rows) if index >= ExcessMortality.FIRST_ROW)
+        
+    data = []
+    for region, mortality in rows:
+        region = ROSSTAT_REGIONS.get(region)
+        if not ROSSTAT_REGIONS.is_valid(region) or not mortality:
+            continue
+        data.append((excel._get_year(), excel._get_month(), region, int(mortality)))
+    return pd.DataFrame(data, columns=['Year', 'Month', 'Region', 'Mortality'])
+
+
+def compare_excel_readers():
+    all_files = ExcessMortality.Analyzator()._get_excel_files()
+    for extension in ('xls', 'xlsx'):
+        files = [file_name for file_name in all_files if file_name.endswith('.' + extension)]
+        
+        start = time.perf_counter()
+        by_cells = [read_excel_by_cells(file_name) for file_name in files]
+        print(extension + ', cells: ' + str(len(files)) + ' files in ' + str(round(time.perf_counter() - start, 3)) + ' s')
+        
+        start = time.perf_counter()
+        by_columns = [ExcessMortality.Excel(file_name).read() for file_name in files]
+        print(extension + ', columns: ' + str(len(files)) + ' files in ' + str(round(time.perf_counter() - start, 3)) + ' s')
+        
+        for file_name, first, second in zip(files, by_cells, by_columns):
+            pd.testing.assert_frame_equal(first, second, check_dtype=False)
+    print('Excel readers give identical tables')
+
+
+def compare_table_parsers(folder=Vaccined.FOLDER + 'pages/'):
+    pages = load_saved_pages(folder)
+    results = {}
+    for name in ('soup', 'lxml'):
+        parser = Vaccined.get_table_parser(name)
+        parsed = {}
+        start = time.perf_counter()
+        for file_name, page in pages:
+            try:
+                parsed[file_name] = parser.parse(page)
+            except RuntimeError:
+                #not a region page
+                continue
+        duration = time.perf_counter() - start
+        results[name] = parsed
+        print(name + ': ' + str(len(parsed)) + ' pages in ' + str(round(duration, 3)) + ' s')
+
+    for file_name, parsed in results['soup'].items():
+        if results['lxml'].get(file_name) != parsed:
+            raise RuntimeError('Parsers give different tables for ' + file_name + ' !')
+    print('Parsers give identical tables')
+    
+    
+def compare_date_decoders(folder=Vaccined.FOLDER + 'pages/'):
+    today = datetime.date.today()
+    columns = [columns[0] for _, (_, columns) in load_saved_tables(folder)]
+    #a page crossing the year boundary
+    columns.append(['3 января', '1 января', '31 декабря', '5 декабря', '1 января', '30 декабря'])
+    #cells with new lines around the text of scraped pages
+    columns.append(['\n3 января', '\n1 января\n', '31 декабря\n', '\n\n5 декабря'])
+    
+    start = time.perf_counter()
+    by_rows = [decode_dates_by_rows(dates, today) for dates in columns]
+    print('rows: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    start = time.perf_counter()
+    vectorized = [Vaccined.decode_dates(dates, today) for dates in columns]
+    print('vectorized: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    for first, second in zip(by_rows, vectorized):
+        if not np.array_equal(first, second):
+            raise RuntimeError('Date decoders give different dates!')
+    print('Date decoders give identical dates')
+
+
+def read_usa_vaccination_at_once(border_dates):
+    #the former VaccinedUSA.Analizator._read_vaccination, which keeps the whole file in memory
+    file_name = VaccinedUSA.FOLDER + 'COVID-19_Vaccinations_in_the_United_States_Jurisdiction.csv'
+    names = ['Date', 'State', 'First', 'FirstPct', 'First65Plus', 'First65PlusPct', 'Second', 'SecondPct', 'Second65Plus', 'Second65PlusPct']
+    usecols = (0, 2, 25, 26, 31, 32, 33, 34, 39, 40)
+    data = pd.read_csv(file_name, header=0, names=names, usecols=usecols, parse_dates=[0])
+    data = data[data.State!='US']
+    data = data.astype({'Date': 'datetime64[D]'})
+    return data[data.Date.isin(border_dates)].reset_index(drop=True)
+
+
+def compare_usa_vaccination_readers(months=('2021-10', '2021-11', '2021-12')):
+    analyzator = VaccinedUSA.Analizator([np.datetime64(month, 'D') for month in months])
+    border_dates = [analyzator._get_border_date(month) for month in analyzator.months]
+    results = {}
+    for name, read in (('at once', read_usa_vaccination_at_once), ('chunks', analyzator._read_vaccination)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        results[name] = read(border_dates)
+        duration = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(name + ': ' + str(round(duration, 3)) + ' s, peak ' + str(round(peak / 2**20, 1)) + ' MiB')
+    
+    chunks = results['chunks'].astype({'State': object})
+    percents = [column for column in chunks.columns if column.endswith('Pct')]
+    counts = [column for column in chunks.columns if column not in percents]
+    pd.testing.assert_frame_equal(results['at once'][counts], chunks[counts], check_dtype=False, check_exact=True)
+    #percents are float32
+    pd.testing.assert_frame_equal(results['at once'][percents], chunks[percents], check_dtype=False, rtol=1e-6)
+    print('USA vaccination readers give identical tables')
+
+
+def select_usa_mortality_by_rows(weekly, month, age_group):
+    #the former VaccinedUSA.Analizator._select_mortlality, which filtered the whole weekly table for every call and corrected the weeks crossing months row by row
+    if age_group == VaccinedUSA.AgeGroups.all:
+        mask_age = [True] * len(weekly)
+    else:
+        mask_age = weekly.Above65 == (age_group == VaccinedUSA.AgeGroups.above65)
+    
+    month = pd.Timestamp(month)
+    next_month = month + pd.DateOffset(months=1)
+    mortality = weekly[(weekly.EndWeek>=month) & (weekly.StartWeek<next_month) & (mask_age)]
+    mortality = mortality[['State', 'StartWeek', 'EndWeek', 'Deaths']].astype({'Deaths': 'float64'})
+    
+    day = np.timedelta64(1, 'D')
+    week = np.timedelta64(7, 'D')
+    for index in mortality.index:
+        row = mortality.loc[index]
+        if row.StartWeek < month:
+            K = (row.EndWeek - month + day) / week 
+            mortality.loc[index, 'Deaths'] = np.round(K * row.Deaths)
+        elif row.EndWeek >= next_month:
+            K = (next_month - row.StartWeek) / week
+            mortality.loc[index, 'Deaths'] = np.round(K * row.Deaths)
+    return mortality.groupby('State').Deaths.sum().reset_index()
+
+
+def compare_usa_mortality(months=[str(year) + '-' + str(month).zfill(2) for year in (2020, 2021) for month in range(1, 13)]):
+    analyzator = VaccinedUSA.Analizator([np.datetime64(month, 'D') for month in months])
+    file_name = VaccinedUSA.FOLDER + 'Weekly_Counts_of_Deaths_by_Jurisdiction_and_Age.csv'
+    names = ['EndWeek', 'State', 'AgeGroup', 'Deaths', 'TypeProcessing']
+    weekly = pd.read_csv(file_name, header=0, names=names, usecols=(1, 2, 5, 6, 8), parse_dates=['EndWeek'])
+    weekly = weekly[weekly.TypeProcessing == VaccinedUSA.PROCESSING[analyzator.use_predicted_mortality]]
+    weekly['Above65'] = weekly.AgeGroup.isin(VaccinedUSA.AGE_GROUPS_ABOVE65)
+    weekly['StartWeek'] = weekly.EndWeek - np.timedelta64(6, 'D')
+    
+    start = time.perf_counter()
+    by_rows = [select_usa_mortality_by_rows(weekly, month, age_group) for month in analyzator.months for age_group in VaccinedUSA.AgeGroups]
+    print('rows: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    by_cube = []
+    for name in ('cube', 'memoized'):
+        start = time.perf_counter()
+        by_cube = [analyzator.mortality.get(month, age_group, VaccinedUSA.PROCESSING[analyzator.use_predicted_mortality])
+                   for month in analyzator.months for age_group in VaccinedUSA.AgeGroups]
+        print(name + ': ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    for first, second in zip(by_rows, by_cube):
+        pd.testing.assert_frame_equal(first, second, check_dtype=False)
+    print('USA mortality is identical')
+
+
+def compare_month_arithmetic(quantity_dates=10000, max_shift=60, seed=0):
+    #timing against dateutil, the properties of the month arithmetic are tested by test_Months.py
+    from dateutil.relativedelta import relativedelta
+    generator = np.random.default_rng(seed)
+    dates = np.datetime64('1990-01-01') + generator.integers(0, 60 * 365, quantity_dates).astype('timedelta64[D]')
+    shifts = generator.integers(-max_shift, max_shift + 1, quantity_dates)
+    
+    start = time.perf_counter()
+    expected = [date.replace(day=1) + relativedelta(months=int(shift)) for date, shift in zip(dates.astype(object), shifts)]
+    print('dateutil: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    start = time.perf_counter()
+    shifted = add_months(dates, shifts)
+    print('datetime64: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    if list(shifted.astype(object)) != expected:
+        raise RuntimeError('add_months differs from dateutil!')
+
+
+def regress_by_groups(points, keys, x_column, y_column, n_boot, confidence=Statistics.CONFIDENCE, seed=0):
+    #scipy fits and bootstraps of every group one by one
+    from scipy.stats import linregress
+    generator = np.random.default_rng(seed)
+    rows = []
+    for key, group in points.groupby(keys, sort=True):
+        x = group[x_column].values
+        y = group[y_column].values
+        result = linregress(x, y)
+        slopes = []
+        for _ in range(n_boot):
+            indices = generator.integers(0, len(x), len(x))
+            slopes.append(np.polyfit(x[indices], y[indices], 1)[0])
+        low, high = np.percentile(slopes, [50 * (1 - confidence), 50 * (1 + confidence)])
+        rows.append(list(key) + [result.slope, result.intercept, result.rvalue, result.pvalue, low, high])
+    return pd.DataFrame(rows, columns=keys + ['Slope', 'Intercept', 'R', 'P_value', 'Slope_Low', 'Slope_High'])
+
+
+def compare_regressions(quantity_groups=18, n_boot=1000, seed=0):
+    #timing only, the regressions are tested by test_Statistics.py
+    generator = np.random.default_rng(seed)
+    groups = []
+    for group in range(quantity_groups):
+        quantity = generator.integers(10, 80)
+        x = generator.random(quantity)
+        groups.append(pd.DataFrame({'Month': group // 6, 'Indicator': group % 6, 'X': x, 'Y': 0.5 * x + generator.normal(0, 0.2, quantity)}))
+    points = pd.concat(groups, ignore_index=True)
+    
+    start = time.perf_counter()
+    by_groups = regress_by_groups(points, ['Month', 'Indicator'], 'X', 'Y', n_boot)
+    print('groups: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    start = time.perf_counter()
+    batched, _ = Statistics.regress(points, ['Month', 'Indicator'], 'X', 'Y', n_boot)
+    print('batched: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+
+
+def compare_rolling_regressions(quantity_months=24, window=3, seed=0):
+    #timing of the batched windows against a regression of every window apart, the equality is tested by test_Statistics.py
+    generator = np.random.default_rng(seed)
+    groups = []
+    for month in range(quantity_months):
+        for indicator in range(2):
+            x = generator.random(80)
+            groups.append(pd.DataFrame({'Month': month, 'Indicator': indicator, 'X': x, 'Y': 0.5 * x + generator.normal(0, 0.2, 80)}))
+    points = pd.concat(groups, ignore_index=True)
+    
+    start = time.perf_counter()
+    by_windows = []
+    for end in range(window - 1, quantity_months):
+        stats, _ = Statistics.regress(points[points.Month.between(end - window + 1, end)], ['Indicator'], 'X', 'Y', 0)
+        stats.insert(1, 'Month', end)
+        by_windows.append(stats)
+    pd.concat(by_windows, ignore_index=True)
+    print('windows: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+    
+    start = time.perf_counter()
+    Statistics.rolling(points, ['Indicator'], 'Month', 'X', 'Y', window)
+    print('batched: ' + str(round(time.perf_counter() - start, 3)) + ' s')
+
+
+def compare_usa_sweep_with_analysis(n_boot=0):
+    #the default combination of the grid must repeat the single analysis
+    analyzator = VaccinedUSA.Analizator(VaccinedUSA.get_analyzed_months())
+    tables = analyzator.analyze(lambda text: None, n_boot)
+    
+    swept = Sweep.run(analyzator, VaccinedUSA.SWEEP_GRID, n_boot)
+    default = np.ones(len(swept), dtype=bool)
+    for name in VaccinedUSA.SWEEP_GRID:
+        default &= swept[name] == getattr(analyzator, name)
+    swept = swept[default].drop(list(VaccinedUSA.SWEEP_GRID), axis=1).reset_index(drop=True)
+    pd.testing.assert_frame_equal(tables['regression'], swept)
+    print('Sweep repeats the analysis')
+
+
+def measure_import_time(module_name):
+    #cold start of an entry point by python -X importtime, the times are in microseconds
+    command = [sys.executable, '-X', 'importtime', '-c', 'import ' + module_name]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError('Failed to import ' + module_name + ': ' + result.stderr.splitlines()[-1] + ' !')
+    
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, package = line[len('import time:'):].split('|')
+        level = (len(package) - len(package.lstrip()) - 1) // 2
+        imports.append((level, package.strip(), int(self_time), int(cumulative)))
+    return imports
+
+
+def compare_import_times(module_names=('Vaccined', 'VaccinedUSA', 'ExcessMortality'), quantity_packages=5):
+    heavy_packages = {'bs4', 'requests', 'lxml', 'xlrd', 'openpyxl', 'seaborn', 'matplotlib', 'PyQt5'}
+    for module_name in module_names:
+        imports = measure_import_time(module_name)
+        total = sum(self_time for _, _, self_time, _ in imports)
+        print(module_name + ': ' + str(round(total / 1e6, 3)) + ' s')
+        
+        #the packages imported by the entry point itself
+        packages = [(cumulative, package) for level, package, _, cumulative in imports if level == 1]
+        for cumulative, package in sorted(packages, reverse=True)[:quantity_packages]:
+            print('    ' + package + ': ' + str(round(cumulative / 1e6, 3)) + ' s')
+        
+        heavy = sorted({package for _, package, _, _ in imports if package in heavy_packages})
+        if heavy:
+            raise RuntimeError(module_name + ' imports ' + ', '.join(heavy) + ' at start!')
+    print('Heavy packages are imported lazily')
+
+if __name__ == '__main__':
+    compare_import_times()
+    compare_table_parsers()
+    compare_date_decoders()
+    compare_row_cleaners()
+    compare_interpolators()
+    compare_excel_readers()
+    compare_mortality_readers()
+    compare_month_arithmetic()
+    compare_regressions()
+    compare_rolling_regressions()
+    compare_usa_vaccination_readers()
+    compare_usa_mortality()
+    compare_usa_sweep_with_analysis()
@@ -0,0 +1,40 @@
+import os, hashlib
+import numpy as np
+import pandas as pd
+
+
+class FileCache:
+    #tables parsed from files, addressed by path, modification time, size and parser version of the file
+    def __init__(self, folder, version):
+        self.folder = folder
+        self.version = version
+        os.makedirs(folder, exist_ok=True)
+        
+    def load(self, file_name):
+        cache_name = self._cache_name(file_name)
+        if not os.path.exists(cache_name):
+            return None
+        
+        with np.load(cache_name, allow_pickle=False) as arrays:
+            return pd.DataFrame({column: arrays[column] for column in arrays.files})
+        
+    def save(self, file_name, data):
+        arrays = {}
+        for column in data.columns:
+            values = data[column].values
+            if values.dtype == object:
+                values = values.astype(str)
+            arrays[column] = values
+            
+        #several processes can write the same file, so it appears only complete
+        cache_name = self._cache_name(file_name)
+        temp_name = cache_name + '.' + str(os.getpid()) + '.tmp'
+        with open(temp_name, 'wb') as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temp_name, cache_name)
+        
+    def _cache_name(self, file_name):
+        stat = os.stat(file_name)
+        key = '|'.join((os.path.abspath(file_name), str(stat.st_mtime_ns), str(stat.st_size), str(self.version)))
+        key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, key + '.npz')
@@ -1,70 +1,61 @@
 import warnings
-import os, sys, glob
+import os, glob, zipfile, posixpath, time
+from xml.etree import ElementTree
 import numpy as np
 import pandas as pd
 import multiprocessing
-import xlrd
-from openpyxl import load_workbook
-import seaborn as sns
-from matplotlib import pyplot as plt
-from PyQt5 import QtGui, QtWidgets
+import Application
+from Regions import ROSSTAT_REGIONS
+from Cache import FileCache
 
 
 warnings.simplefilter(action='ignore')
 FOLDER = '/home/denis/Documents/Covid/Rosstat/'
 COLUMN_REGION = 0
 COLUMN_MORTALITY = 5
+FIRST_ROW = 6
 QUANTITY_REGIONS = 82
+TITLE = 'Анализ избыточной смертности по месяцам для 10 самых крупных регионов'
+PARSER_VERSION = 2 #increase after changes of Excel or ROSSTAT_REGIONS, so that the cached tables are parsed again
 
     
 class Analyzator():
     def __init__(self):
-        sns.set_style('darkgrid')
+        self.quantity_processes = None #all processors
+        self.chunk_size = 1
+        self.quantity_printed_timings = 10
         
-    def analyze(self):
+    def analyze(self, progress=print):
+        progress('Reading of Rosstat tables...')
         all_files = self._get_excel_files()
-        with multiprocessing.Pool() as pool:
-            all_data = pool.map(self._read_excel_file, all_files)
+        all_data = self._read_excel_files(all_files)
         
-        # all_data = []
-        # for file_name in all_files:
-        #     all_data.append(self._read_excel_file(file_name))
-            
         data = pd.concat(all_data)
         if not self._data_is_correct(data):
-            return 0
+            raise RuntimeError('Rosstat tables have different regions!')
+        
+        progress('Counting of excess mortality...')
+        excess = self._count_excess(data)
+        popular_regions = pd.DataFrame({'Region': self._get_popular_regions(data)})
+        return {'excess': excess, 'popular_regions': popular_regions}
+    
+    def _count_excess(self, data):
+        #the mean of the same month before 2019 is the baseline of every region
+        baseline = data[data.Year<=2019]
+        baseline = baseline.groupby(['Region', 'Month']).Mortality.mean()
+        baseline = np.round(baseline).rename('Mean_Mortality').reset_index()
         
+        excess = data[data.Year>2019]
+        excess = pd.merge(excess, baseline, on=['Region', 'Month'])
+        excess['Excess'] = excess.Mortality / excess.Mean_Mortality
+        excess = excess.sort_values(by=['Region', 'Year', 'Month'])
+        return excess.reset_index(drop=True)
+    
+    def _get_popular_regions(self, data):
         popular_regions = data[data.Year<=2019]
-        popular_regions = popular_regions.drop(['Year', 'Month'], axis=1)
-        grouped = popular_regions.groupby('Region')
-        popular_regions = grouped.mean()
-        popular_regions = popular_regions.sort_values(by='Mortality', ascending=False)
-        popular_regions = set(popular_regions.index[:10])
-            
-        for region in popular_regions:
-            mean_region = data[(data.Region==region) & (data.Year<=2019)]
-            mean_region = mean_region.drop(['Region', 'Year'], axis=1)
-            grouped = mean_region.groupby('Month')
-            mean_region = grouped.mean()
-            mean_region = mean_region.rename({'Mortality': 'Mean_Mortality'}, axis=1)
-            mean_region['Mean_Mortality'] = np.round(mean_region['Mean_Mortality'])
-            
-            all_data = None
-            for year in (2020, 2021):
-                year_data = data[(data.Region==region) & (data.Year==year)]
-                year_data = year_data.drop(['Region', 'Year'], axis=1)
-                year_data = pd.merge(year_data, mean_region, left_on=['Month'], right_index=True)
-                year_data[str(year)] = year_data.Mortality / year_data.Mean_Mortality
-                year_data = year_data[['Month', str(year)]]
-                
-                if all_data is None:
-                    all_data = year_data
-                else:
-                    all_data = pd.merge(all_data, year_data, how='left', on='Month')
-            
-            plotter = Plotter(region)    
-            plotter.plot_bar(all_data)
-            plt.show()
+        popular_regions = popular_regions.groupby('Region').Mortality.mean()
+        popular_regions = popular_regions.sort_values(ascending=False)
+        return list(popular_regions.index[:10])
         
     def _data_is_correct(self, data):
         grouped = data.groupby(['Year', 'Month'])
@@ -80,7 +71,7 @@ class Analyzator():
         for year, month in unnormal.index:
             extended_regions = set(data.Region[(data.Year==year) & (data.Month==month)])
             starnge_region = extended_regions - normal_regions
-            print('starnge_region = ' + starnge_region)
+            print('starnge_region = ' + str(starnge_region))
         return 0
         
     def _get_excel_files(self):
@@ -93,32 +84,169 @@ class Analyzator():
             all_files.extend(glob.glob(folder + '/*.xls'))
         return all_files
     
+    def _read_excel_files(self, all_files):
+        cache = FileCache(FOLDER + 'cache/', PARSER_VERSION)
+        all_data = {file_name: cache.load(file_name) for file_name in all_files}
+        
+        #the largest files go first, so that no process is left with a big file at the end
+        new_files = [file_name for file_name, data in all_data.items() if data is None]
+        new_files = sorted(new_files, key=os.path.getsize, reverse=True)
+        if new_files:
+            timings = []
+            with multiprocessing.Pool(self.quantity_processes) as pool:
+                for file_name, duration, arrays in pool.imap_unordered(self._read_excel_file, new_files, self.chunk_size):
+                    data = pd.DataFrame(arrays)
+                    data['Region'] = data.Region.astype(object)
+                    cache.save(file_name, data)
+                    all_data[file_name] = data
+                    timings.append((duration, file_name))
+            self._print_timings(timings)
+        return [all_data[file_name] for file_name in all_files]
+    
+    def _print_timings(self, timings):
+        timings = sorted(timings, reverse=True)
+        print('Parsed ' + str(len(timings)) + ' files, ' + str(round(sum(duration for duration, _ in timings), 1)) + ' s of processor time')
+        for duration, file_name in timings[:self.quantity_printed_timings]:
+            print(str(round(duration, 2)) + ' s ' + file_name)
+    
     @staticmethod
     def _read_excel_file(file_name):
-        excel = Excel(file_name)
-        return excel.read()
+        #arrays are sent back to the main process much cheaper than a DataFrame with python strings
+        start = time.perf_counter()
+        data = Excel(file_name).read()
+        arrays = {column: data[column].values for column in data.columns}
+        arrays['Region'] = arrays['Region'].astype(str)
+        return file_name, time.perf_counter() - start, arrays
 
 
 class Plotter:
     def __init__(self, region):
+        import seaborn as sns
+        from matplotlib import pyplot as plt
+        sns.set_style('darkgrid')
         self.fig = plt.figure()
         self.fig.suptitle(region, fontsize=14)
         
         self.ax = self.fig.add_subplot(1, 1, 1)
         self.ax.set_ylabel('Excess mortality', fontsize=12)
         
-        line = plt.axhline(y=1, linewidth=3, color='k')
-        self.ax.add_patch(line)
+        self.ax.axhline(y=1, linewidth=3, color='k')
         
-    def plot_bar(self, data):
-        data = data.sort_values(by='Month')
+    def plot_bar(self, excess):
+        #excess of one region: a bar for every year in every month
+        data = excess.pivot(index='Month', columns='Year', values='Excess')
+        data.columns = [str(year) for year in data.columns]
         months = {1:"Январь", 2:"Февраль", 3: "Март", 4: "Апрель", 5: "Май", 6: "Июнь", \
                   7: "Июль", 8: "Август", 9: "Сентябрь", 10: "Октябрь", 11: "Ноябрь", 12: "Декабрь"}
-        data = data.replace(months)
-        data = data.set_index('Month')
+        data.index = data.index.map(months)
         data.plot.bar(ax=self.ax, rot=30)
                     
                     
+class XlsxColumns:
+    #a few columns of a sheet streamed straight from its xml, other cells are skipped without building the workbook
+    namespace = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    relationships_namespace = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+    
+    def __init__(self, file_name, sheet_name):
+        self.file_name = file_name
+        self.sheet_name = sheet_name
+        
+    def read(self, columns, first_row):
+        #columns and first_row count from 0, the result has one list per column
+        positions = {column: position for position, column in enumerate(columns)}
+        values = [[] for _ in columns]
+        
+        with zipfile.ZipFile(self.file_name) as archive:
+            shared_strings = self._read_shared_strings(archive)
+            with archive.open(self._get_sheet_path(archive)) as sheet:
+                row = -1
+                for event, element in ElementTree.iterparse(sheet, events=('start', 'end')):
+                    tag = element.tag
+                    if event == 'start':
+                        if tag == self.namespace + 'row':
+                            row = int(element.get('r')) - 1 if element.get('r') else row + 1
+                            column = -1
+                            row_values = [None] * len(columns)
+                        continue
+                    
+                    if tag == self.namespace + 'c':
+                        reference = element.get('r')
+                        column = self._get_column(reference) if reference else column + 1
+                        if column in positions:
+                            row_values[positions[column]] = self._get_value(element, shared_strings)
+                        element.clear()
+                        
+                    elif tag == self.namespace + 'row':
+                        if row >= first_row:
+                            for column_values, value in zip(values, row_values):
+                                column_values.append(value)
+                        element.clear()
+        return values
+    
+    def _get_sheet_path(self, archive):
+        work_book = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        for sheet in work_book.iter(self.namespace + 'sheet'):
+            if sheet.get('name') == self.sheet_name:
+                relationship_id = sheet.get(self.relationships_namespace + 'id')
+                break
+        else:
+            raise RuntimeError('The sheet: ' + self.sheet_name + ' does not exist!')
+        
+        relationships = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        for relationship in relationships:
+            if relationship.get('Id') == relationship_id:
+                target = relationship.get('Target')
+                if target.startswith('/'):
+                    return target[1:]
+                return posixpath.normpath(posixpath.join('xl', target))
+        raise RuntimeError('The sheet: ' + self.sheet_name + ' does not exist!')
+    
+    def _read_shared_strings(self, archive):
+        if 'xl/sharedStrings.xml' not in archive.namelist():
+            return []
+        
+        strings = []
+        with archive.open('xl/sharedStrings.xml') as file:
+            for _, element in ElementTree.iterparse(file):
+                if element.tag != self.namespace + 'si':
+                    continue
+                
+                #plain text or rich text runs, phonetic hints are skipped
+                text = [child.text or '' for child in element if child.tag == self.namespace + 't']
+                for run in element.iter(self.namespace + 'r'):
+                    text.extend(child.text or '' for child in run if child.tag == self.namespace + 't')
+                strings.append(''.join(text))
+                element.clear()
+        return strings
+    
+    def _get_column(self, reference):
+        column = 0
+        for symbol in reference:
+            if symbol.isdigit():
+                break
+            column = 26 * column + ord(symbol) - ord('A') + 1
+        return column - 1
+    
+    def _get_value(self, cell, shared_strings):
+        cell_type = cell.get('t')
+        if cell_type == 'inlineStr':
+            inline = cell.find(self.namespace + 'is')
+            return ''.join(inline.itertext()) if inline is not None else None
+        
+        value = cell.find(self.namespace + 'v')
+        if value is None or value.text is None:
+            return None
+        
+        if cell_type == 's':
+            return shared_strings[int(value.text)]
+        elif cell_type in (None, 'n'):
+            number = float(value.text)
+            return int(number) if number.is_integer() else number
+        elif cell_type == 'b':
+            return value.text == '1'
+        return value.text
+    
+    
 class Excel:
     def __init__(self, file_name):
         self.file_name = file_name
@@ -132,49 +260,35 @@ class Excel:
             raise RuntimeError("Your file- extenstion doesn't support!")
     
     def _read_xls(self):
-        data = []
-        year = self._get_year()
-        month = self._get_month()
+        import xlrd
+        work_book = xlrd.open_workbook(self.file_name, on_demand=True)
+        try:
+            sheet = work_book.sheet_by_name('t1_1')
+            regions = sheet.col_values(COLUMN_REGION, start_rowx=FIRST_ROW)
+            mortality = sheet.col_values(COLUMN_MORTALITY, start_rowx=FIRST_ROW)
+        finally:
+            #on_demand keeps the file open until the resources are released
+            work_book.release_resources()
+        return self._get_table(regions, mortality)
         
-        work_book = xlrd.open_workbook(self.file_name)
-        sheet = work_book.sheet_by_name('t1_1')
+    def _read_xlsx(self):
+        sheet = XlsxColumns(self.file_name, 't1_1')
+        regions, mortality = sheet.read((COLUMN_REGION, COLUMN_MORTALITY), FIRST_ROW)
+        return self._get_table(regions, mortality)
+    
+    def _get_table(self, all_regions, all_mortality):
+        regions = ROSSTAT_REGIONS.replace(pd.Series(all_regions, dtype=object))
         
-        row_count = sheet.nrows
-        for row in range(6, row_count):
-            region = sheet.cell(row, COLUMN_REGION).value
-            region = self._correct_region(region)
-            if not self._valid_region(region):
-                continue
-            
-            mortality = sheet.cell(row, COLUMN_MORTALITY).value
-            if not mortality:
-                continue
-            
-            data.append((year, month, region, int(mortality)))
-        return pd.DataFrame(data, columns=['Year', 'Month', 'Region', 'Mortality'])
+        #empty cells are '' in both readers, the rows without mortality are skipped
+        mortality = pd.Series(all_mortality, dtype=object).replace('', np.nan)
+        mortality = pd.to_numeric(mortality)
+        valid = ROSSTAT_REGIONS.are_valid(regions) & mortality.notnull().values & (mortality.values != 0)
         
-    def _read_xlsx(self):
-        data = []
-        month = self._get_month()
-        year = self._get_year()
-            
-        work_book = load_workbook(filename=self.file_name, read_only=True)
-        sheet = work_book['t1_1']
-        for index, row in enumerate(sheet.rows):
-            if index <= 5:
-                continue
-            
-            region = row[COLUMN_REGION].value
-            region = self._correct_region(region)
-            if not self._valid_region(region):
-                continue
-            
-            mortality = row[COLUMN_MORTALITY].value
-            if not mortality:
-                continue
-            
-            data.append((year, month, region, int(mortality)))
-        return pd.DataFrame(data, columns=['Year', 'Month', 'Region', 'Mortality'])
+        quantity = np.count_nonzero(valid)
+        return pd.DataFrame({'Year': np.full(quantity, self._get_year(), dtype='int16'),
+                             'Month': np.full(quantity, self._get_month(), dtype='int8'),
+                             'Region': regions.values[valid],
+                             'Mortality': mortality.values[valid].astype('uint32')})
     
     def _get_year(self):
         base_name = os.path.basename(self.file_name)
@@ -193,65 +307,23 @@ class Excel:
         pos2 = pos2 if pos2>=0 else 1000
         pos = min(pos1, pos2)
         return int(base_name[pos: pos+2])
-    
-    def _correct_region(self, region):
-        if region is None:
-            return region
-        
-        region = region.strip()
-        
-        pos = region.find('(')
-        if pos >= 0:
-            region = region[:pos]
-        
-        if region == 'Республика Северная Осетия-Алания':
-            region = 'Республика Северная Осетия- Алания'
-             
-        symbol_table = str.maketrans('', '', '0123456789(){}[]')
-        region = region.translate(symbol_table)
-        return region
-        
-    def _valid_region(self, region):
-        if region is None:
-            return False
-        
-        if region == 'А' or \
-            region.endswith('авт.округ') or \
-            region.endswith('без автономии') or \
-            region.endswith(' округ') or \
-            region == 'Российская Федерация':
-            return False
-        return True
 
-def analyze():
+def analyze(progress=print, n_boot=None):
+    #there are no regressions, n_boot is accepted for Application
     counter = Analyzator()
-    counter.analyze()     
-              
-def build_window():       
-    window = QtWidgets.QWidget()
-    window.resize(600, 100)
-    
-    label = QtWidgets.QLabel()
-    label.setText('Анализ избыточной смертности по месяцам для 10 самых крупных регионов')
+    return counter.analyze(progress)
 
-    myFont=QtGui.QFont()
-    myFont.setPointSize(14)
-    myFont.setBold(True)
-    label.setFont(myFont)
-
-    button = QtWidgets.QCommandLinkButton("Analyze")
-    button.clicked.connect(analyze)
+def plot(tables):
+    excess = tables['excess']
+    for region in tables['popular_regions'].Region:
+        plotter = Plotter(region)
+        plotter.plot_bar(excess[excess.Region==region])
     
-    vbox = QtWidgets.QVBoxLayout()
-    vbox.addWidget(label)
-    vbox.addWidget(button)
-    window.setLayout(vbox)
-    return window
+def split(tables):
+    #a figure for every region
+    excess = tables['excess']
+    return [(region, {'excess': excess[excess.Region==region], 'popular_regions': pd.DataFrame({'Region': [region]})})
+            for region in tables['popular_regions'].Region]
     
 if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
-    window = build_window()    
-    window.show()
-    sys.exit(app.exec_())
-            
-    
+    Application.run(TITLE, 'excess', analyze, plot, split)
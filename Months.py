@@ -0,0 +1,33 @@
+import numpy as np
+
+
+MONTH_NAMES = ('Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+               'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь')
+
+
+def get_months(dates):
+    #dates, datetime.date or Timestamp values are truncated to their months
+    return np.asarray(dates).astype('datetime64[M]')
+
+
+def add_months(dates, quantity):
+    #the first days of the months shifted by quantity, dates and quantity can be arrays
+    months = get_months(dates) + np.asarray(quantity, dtype='int64')
+    return months.astype('datetime64[D]')
+
+
+def split_months(dates):
+    #years and numbers of months from 1 to 12
+    months = get_months(dates).astype('int64')
+    return months // 12 + 1970, months % 12 + 1
+
+
+def get_month_range(first, last):
+    #the first days of all months from first to last inclusive
+    months = np.arange(get_months(first), get_months(last) + 1)
+    return months.astype('datetime64[D]')
+
+
+def get_month_name(date):
+    year, month = split_months(date)
+    return MONTH_NAMES[int(month) - 1] + ' ' + str(int(year)) + 'г'
@@ -0,0 +1,65 @@
+import re, functools
+import numpy as np
+import pandas as pd
+
+
+class RegionNames:
+    #canonical names of regions: the text in brackets and the removed words are cut off, then the aliases are applied
+    def __init__(self, removed, aliases, excluded=None):
+        self.removed = re.compile(removed)
+        self.aliases = aliases
+        self.excluded = re.compile(excluded) if excluded else None
+        self.get = functools.lru_cache(maxsize=None)(self._get)
+
+    def replace(self, regions):
+        #every distinct name of the column is converted only once
+        codes, names = pd.factorize(regions)
+        names = np.array([self.get(name) for name in names] + [None], dtype=object)
+        return pd.Series(names[codes], index=regions.index, name=regions.name)
+
+    def are_valid(self, regions):
+        #is_valid of a column of names, every distinct name is checked only once
+        codes, names = pd.factorize(regions)
+        valid = np.array([self.is_valid(name) for name in names] + [False], dtype=bool)
+        return valid[codes]
+
+    def is_valid(self, region):
+        if region is None:
+            return False
+
+        if self.excluded is not None and self.excluded.search(region):
+            return False
+        return True
+
+    def _get(self, region):
+        if region is None:
+            return region
+
+        pos = region.find('(')
+        if pos >= 0:
+            region = region[:pos]
+
+        region = self.removed.sub('', region).strip()
+        return self.aliases.get(region, region)
+
+
+def _words(*words):
+    return '|'.join(re.escape(word) for word in words)
+
+
+#short names for matching gogov.ru, Rosstat and population tables
+RUSSIAN_REGIONS = RegionNames(
+    removed=_words('автономный округ', 'автономная область', 'авт.округ', 'авт.область', 'Республика', 'область', 'край',
+                   'обл.', 'АО', 'г.'),
+    aliases={'Чувашская': 'Чувашия',
+             'Ханты-Мансийский -Югра': 'Ханты-Мансийский',
+             'Удмуртская': 'Удмуртия',
+             'Hенецкий': 'Ненецкий',
+             'Ямало-Hенецкий': 'Ямало-Ненецкий',
+             'Hижегородская': 'Нижегородская'})
+
+#full names of Rosstat workbooks without footnote marks, aggregated rows are excluded
+ROSSTAT_REGIONS = RegionNames(
+    removed=r'[0-9(){}\[\]]',
+    aliases={'Республика Северная Осетия-Алания': 'Республика Северная Осетия- Алания'},
+    excluded=r'^А$|авт\.округ$|без автономии$| округ$|^Российская Федерация$')
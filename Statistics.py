@@ -0,0 +1,119 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+
+N_BOOT = 1000 #resamples of the confidence intervals, as in seaborn
+CONFIDENCE = 0.95
+QUANTITY_BAND_POINTS = 50
+
+
+def regress(points, keys, x_column, y_column, n_boot=N_BOOT, confidence=CONFIDENCE, seed=0):
+    #linear regressions of all groups of points at once, returns the statistics of every group
+    #and the fitted lines with their bootstrap confidence bands
+    grouped = points.groupby(keys, sort=True)
+    sizes = grouped.size()
+    x, y, mask = _get_matrices(grouped.ngroup().values, sizes.values, points[x_column].values, points[y_column].values)
+
+    slope, intercept, r = _fit(x, y, mask)
+    quantity = sizes.values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt((quantity - 2) / (1 - r * r))
+    from scipy.stats import t as t_distribution
+    p_value = 2 * t_distribution.sf(np.abs(t), quantity - 2)
+
+    stats = sizes.rename('N').reset_index()
+    stats['Slope'] = slope
+    stats['Intercept'] = intercept
+    stats['R'] = r
+    stats['P_value'] = p_value
+
+    x_min = np.where(mask, x, np.inf).min(axis=1)
+    x_max = np.where(mask, x, -np.inf).max(axis=1)
+    band_x = x_min[:, None] + (x_max - x_min)[:, None] * np.linspace(0, 1, QUANTITY_BAND_POINTS)
+    band_low = np.full(band_x.shape, np.nan)
+    band_high = np.full(band_x.shape, np.nan)
+    for column in ('Slope', 'Intercept'):
+        stats[column + '_Low'] = np.nan
+        stats[column + '_High'] = np.nan
+
+    if n_boot:
+        boot_slope, boot_intercept = _bootstrap(x, y, quantity, n_boot, seed)
+        percents = [50 * (1 - confidence), 50 * (1 + confidence)]
+        #groups of one point or of one x have no resamples with a line
+        with np.errstate(invalid='ignore'), warnings.catch_warnings():
+            warnings.filterwarnings('ignore', 'All-NaN slice encountered', RuntimeWarning)
+            stats[['Slope_Low', 'Slope_High']] = np.nanpercentile(boot_slope, percents, axis=1).T
+            stats[['Intercept_Low', 'Intercept_High']] = np.nanpercentile(boot_intercept, percents, axis=1).T
+
+            #the band is made of the lines of all resamples at the points of the grid
+            lines = boot_intercept[:, :, None] + boot_slope[:, :, None] * band_x[:, None, :]
+            band_low, band_high = np.nanpercentile(lines, percents, axis=1)
+
+    bands = stats[keys].loc[stats.index.repeat(QUANTITY_BAND_POINTS)].reset_index(drop=True)
+    bands['X'] = band_x.ravel()
+    bands['Y'] = (intercept[:, None] + slope[:, None] * band_x).ravel()
+    bands['Low'] = band_low.ravel()
+    bands['High'] = band_high.ravel()
+    return stats, bands
+
+
+def rolling(points, keys, period_column, x_column, y_column, window, n_boot=0, seed=0):
+    #regressions over the points of window consecutive periods ending at every period, all windows are counted in one pass
+    periods = np.sort(points[period_column].unique())
+    windows = []
+    for end in range(window - 1, len(periods)):
+        in_window = points[period_column].isin(periods[end - window + 1: end + 1])
+        windows.append(points[in_window].assign(**{period_column: periods[end]}))
+    if not windows:
+        raise RuntimeError('Rolling regressions need at least ' + str(window) + ' periods, there are ' + str(len(periods)) + ' !')
+
+    stats, _ = regress(pd.concat(windows, ignore_index=True), keys + [period_column], x_column, y_column, n_boot, seed=seed)
+    return stats
+
+
+def _get_matrices(groups, sizes, x, y):
+    #points of every group in its row, the rows are padded up to the largest group
+    order = np.argsort(groups, kind='mergesort')
+    groups = groups[order]
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    columns = np.arange(len(groups)) - offsets[groups]
+
+    shape = (len(sizes), sizes.max() if len(sizes) else 0)
+    x_matrix = np.zeros(shape)
+    y_matrix = np.zeros(shape)
+    x_matrix[groups, columns] = x[order]
+    y_matrix[groups, columns] = y[order]
+    mask = np.arange(shape[1]) < sizes[:, None]
+    return x_matrix, y_matrix, mask
+
+
+def _fit(x, y, mask):
+    #least squares along the last axis, only the masked points are used
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quantity = mask.sum(axis=-1)
+        x_mean = np.where(mask, x, 0).sum(axis=-1) / quantity
+        y_mean = np.where(mask, y, 0).sum(axis=-1) / quantity
+        dx = np.where(mask, x - x_mean[..., None], 0)
+        dy = np.where(mask, y - y_mean[..., None], 0)
+
+        sxx = (dx * dx).sum(axis=-1)
+        sxy = (dx * dy).sum(axis=-1)
+        syy = (dy * dy).sum(axis=-1)
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        r = sxy / np.sqrt(sxx * syy)
+    return slope, intercept, r
+
+
+def _bootstrap(x, y, quantity, n_boot, seed):
+    #all resamples of all groups are drawn as one matrix: group x resample x point
+    generator = np.random.default_rng(seed)
+    draws = generator.random((x.shape[0], n_boot, x.shape[1]))
+    indices = (draws * quantity[:, None, None]).astype('int64')
+    mask = np.broadcast_to(np.arange(x.shape[1]) < quantity[:, None, None], indices.shape)
+
+    boot_x = np.take_along_axis(x[:, None, :], indices, axis=2)
+    boot_y = np.take_along_axis(y[:, None, :], indices, axis=2)
+    slope, intercept, _ = _fit(boot_x, boot_y, mask)
+    return slope, intercept
@@ -0,0 +1,41 @@
+import time, itertools, multiprocessing
+import pandas as pd
+
+
+_analyzator = None #of the workers, inherited by fork without copying or pickled where fork is absent
+
+
+def run(analyzator, grid, n_boot, quantity_processes=None, progress=print):
+    #grid maps attributes of analyzator to their values, analyzator.regress(n_boot) is evaluated for every combination of them,
+    #analyzator.prepare(grid) loads the data once, the workers get it from fork without copying
+    names = list(grid)
+    tasks = [(names, values, n_boot) for values in itertools.product(*(grid[name] for name in names))]
+    progress('Loading of data for ' + str(len(tasks)) + ' combinations...')
+    analyzator.prepare(grid)
+
+    start = time.perf_counter()
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        #Windows
+        context = multiprocessing.get_context()
+    with context.Pool(quantity_processes, initializer=_set_analyzator, initargs=(analyzator,)) as pool:
+        results = pool.map(_regress, tasks)
+    progress('Swept ' + str(len(tasks)) + ' combinations in ' + str(round(time.perf_counter() - start, 1)) + ' s')
+    return pd.concat(results, ignore_index=True)
+
+
+def _set_analyzator(analyzator):
+    global _analyzator
+    _analyzator = analyzator
+
+
+def _regress(task):
+    names, values, n_boot = task
+    for name, value in zip(names, values):
+        setattr(_analyzator, name, value)
+
+    stats = _analyzator.regress(n_boot)
+    for position, (name, value) in enumerate(zip(names, values)):
+        stats.insert(position, name, value)
+    return stats
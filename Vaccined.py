@@ -1,13 +1,16 @@
 import warnings
-import os, sys
-import time, requests, datetime
+import os, re, glob
+import time, datetime, threading, hashlib, json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 import numpy as np
 import pandas as pd
-import bs4
-from bs4 import BeautifulSoup
-import seaborn as sns
-from matplotlib import pyplot as plt
-from PyQt5 import QtGui, QtWidgets
+from Regions import RUSSIAN_REGIONS
+from Months import add_months, split_months, get_month_name
+from Cache import FileCache
+import Statistics
+import Sweep
+import Application
 
 
 warnings.simplefilter(action='ignore')
@@ -16,168 +19,487 @@ FOLDER = '/home/denis/Documents/Covid/Russia/'
 PERIOD_DISEASE = 10
 DELAY_VACCINATION_DATA = 5
 BUILD_HALF_REIONS = True
+SWEEP_GRID = {'period_disease': range(1, 31), 'delay_vaccination_data': range(10), 'build_half_regions': (True, False),
+              'max_part_unvaccined': (0.75, 0.9, 1)}
+INDICATORS = ('Vaccinated', 'FullyVaccinated')
+ROLLING_MONTHS = 3 #months in every regression of the series
+TITLE = 'Анализ избыточной смертности в зависимости от доли невакцинированного населения в России'
+PARSER_VERSION = 2 #increase after changes of the readers of CSV, so that the cached tables are parsed again
 
 
+MONTHS = {'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4, 'мая': 5, 'июня': 6,
+          'июля': 7, 'августа': 8, 'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12}
+
+
+def decode_dates(date_strings, today=None):
+    #dates like '5 декабря' go from new to old, so the year decreases every time the day of year grows
+    if today is None:
+        today = datetime.date.today()
+        
+    #cells of scraped pages can begin with spaces or new lines
+    parts = pd.Series(date_strings, dtype=object).str.strip().str.extract(r'^(\d+)\s+(\w+)')
+    months = parts[1].map(MONTHS)
+    unknown = np.flatnonzero(months.isnull().values)
+    if len(unknown):
+        raise RuntimeError("Couldn't recognize the date: " + str(date_strings[unknown[0]]) + ' !')
+    
+    month_days = 100 * months.values.astype('int32') + parts[0].values.astype('int32')
+    previous = np.concatenate(([100 * today.month + today.day], month_days[:-1]))
+    years = today.year - np.cumsum(month_days > previous)
+    return (10000 * years + month_days).astype('int32')
+
+
+def decode_ints(int_strings):
+    values = pd.Series(int_strings, dtype=object).str.replace(' ', '', regex=False)
+    values = values.where(values != '', '0')
+    return pd.to_numeric(values).values.astype('uint32')
+
+
+class RateLimiter:
+    #token bucket: allows short bursts, but no more than rate requests per second on average
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_time = time.monotonic()
+        self.lock = threading.Lock()
+        
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_time) * self.rate)
+                self.last_time = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class PageCache:
+    #downloaded pages with their ETag/Last-Modified, so that refreshes can use conditional requests
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        
+    def request_headers(self, url):
+        headers = {}
+        validators_file = self._file_name(url, 'json')
+        if not os.path.exists(validators_file) or not os.path.exists(self._file_name(url, 'html')):
+            return headers
+        
+        with open(validators_file, encoding='utf-8') as file:
+            validators = json.load(file)
+        if validators.get('ETag'):
+            headers['If-None-Match'] = validators['ETag']
+        if validators.get('Last-Modified'):
+            headers['If-Modified-Since'] = validators['Last-Modified']
+        return headers
+    
+    def load(self, url):
+        with open(self._file_name(url, 'html'), encoding='utf-8') as file:
+            return file.read()
+        
+    def save(self, url, response):
+        with open(self._file_name(url, 'html'), 'w', encoding='utf-8') as file:
+            file.write(response.text)
+            
+        #validators are written last: they are valid only together with the page
+        validators = {'URL': url, 'ETag': response.headers.get('ETag'), 'Last-Modified': response.headers.get('Last-Modified')}
+        with open(self._file_name(url, 'json'), 'w', encoding='utf-8') as file:
+            json.dump(validators, file)
+    
+    def _file_name(self, url, extension):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, key + '.' + extension)
+
+
+class SoupTableParser:
+    #pure python parser, works everywhere but slowly
+    quantity_columns = 4
+    
+    def parse(self, page):
+        import bs4
+        soup = bs4.BeautifulSoup(page, 'html.parser')
+        
+        try:
+            table = soup.select('.table-box-400 > table:nth-child(1)')
+            table_data = list(table[0].contents)
+        except:
+            raise RuntimeError("Page doesn't contain data table!")
+        
+        table_data = [row for row in table_data if type(row)==bs4.Tag]
+        header = table_data[0].text
+        
+        columns = [[] for _ in range(self.quantity_columns)]
+        for row in table_data[1:]:
+            values = [value.text for value in row.find_all('td', limit=self.quantity_columns)]
+            values += [''] * (self.quantity_columns - len(values))
+            for column, value in zip(columns, values):
+                column.append(value)
+        return header, columns
+    
+    
+class LxmlTableParser(SoupTableParser):
+    #the same table through libxml2, without building the whole BeautifulSoup tree
+    table_path = "//*[contains(concat(' ', normalize-space(@class), ' '), ' table-box-400 ')]/*[1][self::table]"
+    
+    def parse(self, page):
+        import lxml.html
+        tree = lxml.html.fromstring(page)
+        table = tree.xpath(self.table_path)
+        if not table:
+            raise RuntimeError("Page doesn't contain data table!")
+        
+        table_data = [row for row in table[0] if isinstance(row.tag, str)]
+        header = table_data[0].text_content()
+        
+        columns = [[] for _ in range(self.quantity_columns)]
+        for row in table_data[1:]:
+            values = [value.text_content() for value in row.iter('td')][:self.quantity_columns]
+            values += [''] * (self.quantity_columns - len(values))
+            for column, value in zip(columns, values):
+                column.append(value)
+        return header, columns
+    
+    
+def get_table_parser(name=None):
+    if name is None:
+        name = 'lxml' if _has_lxml() else 'soup'
+        
+    if name == 'lxml':
+        if not _has_lxml():
+            raise RuntimeError('Table parser lxml needs the package lxml, install it or use the parser soup !')
+        return LxmlTableParser()
+    elif name == 'soup':
+        return SoupTableParser()
+    else:
+        raise RuntimeError('Unknown table parser: ' + name + ' !')
+
+
+def _has_lxml():
+    try:
+        import lxml.html
+    except ImportError:
+        return False
+    return True
+
+
+class VaccinationStore:
+    #vaccination sorted by (Region, Date), the rows of every region lie between its offsets
+    columns = ('Date', 'Vaccinated', 'FullyVaccinated', 'Revaccinated')
+    
+    def __init__(self, data):
+        #a day appended twice by an interrupted update is kept once, the last appended row wins
+        data = data.sort_values(by=['Region', 'Date'], kind='mergesort')
+        data = data[~data.duplicated(subset=['Region', 'Date'], keep='last')]
+        regions = data.Region.values
+        
+        starts = np.flatnonzero(np.r_[True, regions[1:] != regions[:-1]]) if len(regions) else np.array([], dtype=int)
+        self.regions = list(regions[starts])
+        self.offsets = np.append(starts, len(regions))
+        self.positions = {region: position for position, region in enumerate(self.regions)}
+        self.data = {column: np.ascontiguousarray(data[column].values) for column in self.columns if column in data}
+        
+    @classmethod
+    def read(cls, file_name, key, where=None):
+        return cls(pd.read_hdf(file_name, key=key, where=where))
+        
+    def get(self, region, column):
+        #view without copying
+        position = self.positions[region]
+        return self.data[column][self.offsets[position]:self.offsets[position+1]]
+    
+    def rename_regions(self, get_name):
+        regions = [get_name(region) for region in self.regions]
+        names = {}
+        for old_name, region in zip(self.regions, regions):
+            if region in names:
+                raise RuntimeError('Regions ' + names[region] + ' and ' + old_name + ' have the same name ' + str(region) + ' !')
+            names[region] = old_name
+        self.regions = regions
+        self.positions = {region: position for position, region in enumerate(self.regions)}
+    
+    def get_region(self, region):
+        return {column: self.get(region, column) for column in self.data}
+    
+    def __len__(self):
+        return int(self.offsets[-1])
+    
+    
+def int_to_datetime64(date_ints):
+    #dates like 20211026
+    date_ints = np.asarray(date_ints)
+    years = (date_ints // 10000 - 1970).astype('datetime64[Y]')
+    months = (date_ints // 100 % 100 - 1).astype('timedelta64[M]')
+    days = (date_ints % 100 - 1).astype('timedelta64[D]')
+    return (years + months).astype('datetime64[D]') + days
+
+
+def datetime64_to_int(dates):
+    #inverse of int_to_datetime64
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    years, months = split_months(dates)
+    days = (dates - dates.astype('datetime64[M]')).astype('int64') + 1
+    return (10000 * years + 100 * months + days).astype('int32')
+
+
+class VaccinationInterpolator:
+    #values of one column at any dates by business days, for all regions at once
+    def __init__(self, store, column):
+        self.column = column
+        
+        regions = np.repeat(np.arange(len(store.regions)), np.diff(store.offsets))
+        positive = store.data[column] > 0
+        regions = regions[positive]
+        self.dates = store.data['Date'][positive]
+        self.values = store.data[column][positive].astype('float64')
+        
+        #at least two days are needed for a line
+        offsets = np.searchsorted(regions, np.arange(len(store.regions) + 1))
+        valid = np.diff(offsets) >= 2
+        self.regions = np.array(store.regions, dtype=object)[valid]
+        self.region_numbers = np.flatnonzero(valid)
+        self.starts = offsets[:-1][valid]
+        self.stops = offsets[1:][valid]
+        
+        #(region, date) packed into one sorted key
+        self.keys = regions.astype('int64') * 100000000 + self.dates
+        
+    def interpolate(self, border_dates):
+        border_dates = np.asarray(border_dates, dtype='int64')
+        quantity_regions = len(self.regions)
+        region_numbers = np.tile(self.region_numbers, len(border_dates))
+        starts = np.tile(self.starts, len(border_dates))
+        stops = np.tile(self.stops, len(border_dates))
+        borders = np.repeat(border_dates, quantity_regions)
+        
+        #the first row is always newer than the second
+        keys = region_numbers * 100000000 + borders
+        first = np.searchsorted(self.keys, keys, side='left')
+        second = np.searchsorted(self.keys, keys, side='right') - 1
+        
+        newer = borders > self.dates[stops - 1]
+        first[newer] = stops[newer] - 1
+        second[newer] = stops[newer] - 2
+        
+        older = borders < self.dates[starts]
+        first[older] = starts[older] + 1
+        second[older] = starts[older]
+        
+        first_dates = int_to_datetime64(self.dates[first])
+        second_dates = int_to_datetime64(self.dates[second])
+        first_values = self.values[first]
+        second_values = self.values[second]
+        
+        derivative_period = np.busday_count(second_dates, first_dates)
+        shift_period = np.busday_count(second_dates, int_to_datetime64(borders))
+        exact = (derivative_period == 0) | (shift_period == 0)
+        
+        derivative = (first_values - second_values) / np.where(exact, 1, derivative_period)
+        values = np.where(exact, second_values, second_values + derivative * shift_period)
+        
+        #positive correction mean interpolation, negative- extrapolation
+        delta_first = first_values - values
+        delta_second = values - second_values
+        corrections = np.where(np.abs(delta_first) < np.abs(delta_second), delta_first / first_values, delta_second / second_values)
+        corrections[exact] = np.nan
+        
+        values = np.maximum(values, 0).astype('uint32')
+        return pd.DataFrame({'Region': np.tile(self.regions, len(border_dates)), 'Date': borders.astype('int32'),
+                             self.column: values, 'Correction': corrections})
+    
+    
+class RegionIndex:
+    #integer ids of regions, values of every dataset are kept in arrays indexed by them
+    def __init__(self, regions):
+        self.regions = pd.Index(regions).drop_duplicates()
+        
+    def align(self, regions, values):
+        duplicated = pd.Index(regions).duplicated()
+        if duplicated.any():
+            raise RuntimeError('Region ' + str(pd.Index(regions)[duplicated][0]) + ' is repeated in aligned values !')
+        
+        aligned = np.full(len(self.regions), np.nan)
+        ids = self.regions.get_indexer(regions)
+        found = ids >= 0
+        aligned[ids[found]] = np.asarray(values, dtype='float64')[found]
+        return aligned
+    
+    def __len__(self):
+        return len(self.regions)
+    
+    
 class VaccinationData:
     def __init__(self):
         self.table_name = 'data'
+        self.last_dates_name = 'last_dates'
+        self.data_columns = ['Region', 'Date']
         self.file_name = FOLDER + 'vaccination_data.hdf'
+        self.page_cache = PageCache(FOLDER + 'pages/')
+        self.table_parser = get_table_parser()
         
         self.quantity_attempts = 3
         self.time_out_after_error = 120
+        self.quantity_workers = 4
         if os.path.exists(self.file_name):
-            self.time_out_after_success = 0
+            self.requests_per_second = 2
         else:
-            self.time_out_after_success = 60
+            self.requests_per_second = 0.5
+        self.rate_limiters = {}
+        self.rate_limiters_lock = threading.Lock()
             
         self.domain = 'https://gogov.ru'
         self.start_url = self.domain + '/articles/covid-v-stats'
         self.connection_time_out = 60
         self.headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.14; rv:68.0) Gecko/20100101 Firefox/68.0'}
+        
+        #keep-alive connections shared by all workers, the scraping stack is imported only when it is needed
+        self.session = None
+        self.session_lock = threading.Lock()
 
-    def get(self):
+    def get(self, where=None):
+        #where is a PyTables condition on the data columns, e.g. 'Date >= 20211001'
         self._write_vaccination()
-        return pd.read_hdf(self.file_name, key=self.table_name)
+        return VaccinationStore.read(self.file_name, self.table_name, where)
         
     def _write_vaccination(self):
-        if os.path.exists(self.file_name):
-            downloaded_regions = pd.read_hdf(self.file_name, key=self.table_name, columns=['Region'])
-            downloaded_regions = set(downloaded_regions.Region)
-        else:
-            downloaded_regions = set()
+        self._add_data_columns()
+        last_dates = self._read_last_dates()
         
-        page = self._download(self.start_url)
-        soup = BeautifulSoup(page.text, 'html.parser')
+        import bs4
+        page, _ = self._get_page(self.start_url)
+        soup = bs4.BeautifulSoup(page, 'html.parser')
         table = soup.select('#m-table')
         regions = list(table[0].tbody.contents)
         regions = [region for region in regions if type(region)==bs4.Tag]
         regions = sorted(regions, key=lambda region: len(region.a.text), reverse=True) #for correct writing to hdf5
         regions = {region.a.text: region.a.get('href') for region in regions}
         
-        for region, url in regions.items():
-            if region in downloaded_regions:
-                continue
-            
-            print(region)
-            region_page = self._download(self.domain + url)
-            region_data = self._get_region_data(region_page)
-            region_data['Region'] = region
-            region_data.to_hdf(self.file_name, key=self.table_name, mode='a', complevel=4, append=True, format='table')
-            
-    def _get_region_data(self, page):
-        def get_date_int(date_str, prev_date, year):
-            pos = date_str.find(' ')
-            day = int(date_str[:pos])
-            
-            current_date = 10000 * year
-            if date_str.find('декабря') >= 0:
-                current_date += 100 * 12
-            elif date_str.find('ноября') >= 0:
-                current_date += 100 * 11
-            elif date_str.find('октября') >= 0:
-                current_date += 100 * 10
-            elif date_str.find('сентября') >= 0:
-                current_date += 100 * 9
-            elif date_str.find('августа') >= 0:
-                current_date += 100 * 8
-            elif date_str.find('июля') >= 0:
-                current_date += 100 * 7
-            elif date_str.find('июня') >= 0:
-                current_date += 100 * 6
-            elif date_str.find('мая') >= 0:
-                current_date += 100 * 5
-            elif date_str.find('апреля') >= 0:
-                current_date += 100 * 4
-            elif date_str.find('марта') >= 0:
-                current_date += 100 * 3
-            elif date_str.find('февраля') >= 0:
-                current_date += 100 * 2
-            elif date_str.find('января') >= 0:
-                current_date += 100 * 1
-            else:
-                raise RuntimeError("Couldn't recognize the date: " + date_str + ' !')
-            
-            current_date += day
-            if current_date > prev_date:
-                #year has changed
-                current_date -= 10000
-                year -= 1
-            return current_date, year
-                
-        def get_int(int_str):
-            int_str = int_str.replace(' ', '')
-            if int_str:
-                return np.uint32(int_str)
-            else:
-                return 0
-            
-        soup = BeautifulSoup(page.text, 'html.parser')
+        #pages arrive in any order, so reserve the place for the longest new name
+        new_regions = [region for region in regions if region not in last_dates]
+        region_size = max((len(region.encode('utf-8')) for region in new_regions), default=0)
+        min_itemsize = {'Region': region_size}
         
+        #the dates of the appended regions are written even after an error, otherwise the next run appends them again
         try:
-            table = soup.select('.table-box-400 > table:nth-child(1)')
-            table_data = list(table[0].contents)
-        except:
-            raise RuntimeError("Page doesn't contain data table!")
+            with ThreadPoolExecutor(max_workers=self.quantity_workers) as executor:
+                futures = {executor.submit(self._get_page, self.domain + url): region for region, url in regions.items()}
+                for future in as_completed(futures):
+                    region = futures[future]
+                    page, changed = future.result()
+                    if not changed and region in last_dates:
+                        continue
+                    
+                    region_data = self._get_region_data(page, last_dates.get(region, 0))
+                    if region_data.empty:
+                        continue
+                    
+                    print(region)
+                    region_data['Region'] = region
+                    region_data.to_hdf(self.file_name, key=self.table_name, mode='a', complevel=4, append=True, format='table',
+                                       data_columns=self.data_columns, min_itemsize=min_itemsize)
+                    last_dates[region] = int(region_data.Date.max())
+        finally:
+            self._write_last_dates(last_dates)
+                    
+    def _add_data_columns(self):
+        #files written before Region and Date became data columns are rewritten once, so that where conditions work with them
+        if not os.path.exists(self.file_name):
+            return
+        with pd.HDFStore(self.file_name, mode='r') as store:
+            if self.table_name not in store or set(self.data_columns) <= set(store.get_storer(self.table_name).data_columns):
+                return
+            tables = {key.lstrip('/'): store[key] for key in store.keys()}
+        
+        #the new file replaces the old one only complete
+        temp_name = self.file_name + '.' + str(os.getpid()) + '.tmp'
+        for key, data in tables.items():
+            if key == self.table_name:
+                region_size = int(data.Region.str.encode('utf-8').str.len().max())
+                data.to_hdf(temp_name, key=key, mode='a', complevel=4, format='table', data_columns=self.data_columns,
+                            min_itemsize={'Region': region_size})
+            else:
+                data.to_hdf(temp_name, key=key, mode='a', format='table')
+        os.replace(temp_name, self.file_name)
         
-        table_data = [row for row in table_data if type(row)==bs4.Tag]
-        columns = table_data[0].text
-        if columns.find('ревакцинация') >= 0:
-            exist_revaccination = True
+    def _read_last_dates(self):
+        if not os.path.exists(self.file_name):
+            return {}
+        
+        with pd.HDFStore(self.file_name, mode='r') as store:
+            exist_last_dates = self.last_dates_name in store
+            
+        if exist_last_dates:
+            last_dates = pd.read_hdf(self.file_name, key=self.last_dates_name)
         else:
-            exist_revaccination = False
-        
-        current_date = datetime.date.today()
-        prev_date = int(current_date.strftime('%Y%m%d'))
-        
-        data = []
-        year = current_date.year
-        rows = table_data[1:]
-        for row in rows:
-            values = row.find_all('td')
-            current_date_str = values[0].text
-            current_date_int, year = get_date_int(current_date_str, prev_date, year)
-            prev_date = current_date_int
-                
-            vaccinated = get_int(values[1].text)
-            fully_vaccinated = get_int(values[2].text)
+            #file was written before the dates were tracked
+            last_dates = pd.read_hdf(self.file_name, key=self.table_name, columns=['Region', 'Date'])
+            last_dates = last_dates.groupby('Region').Date.max().reset_index()
+        return dict(zip(last_dates.Region, last_dates.Date.astype(int)))
+    
+    def _write_last_dates(self, last_dates):
+        if not last_dates:
+            return
+        
+        last_dates = pd.DataFrame({'Region': list(last_dates.keys()), 'Date': list(last_dates.values())})
+        last_dates = last_dates.astype({'Date': 'int32'})
+        last_dates.to_hdf(self.file_name, key=self.last_dates_name, mode='a', format='table')
             
-            if exist_revaccination:
-                revaccinated = get_int(values[3].text)
-            else:
-                revaccinated = 0
-                
-            data.append((current_date_int, vaccinated, fully_vaccinated, revaccinated))
+    def _get_region_data(self, page, last_date=0):
+        header, columns = self.table_parser.parse(page)
+        dates = decode_dates(columns[0])
+        
+        #days go from new to old, the first stored day is needed only for comparing with the next day
+        stored = np.flatnonzero(dates <= last_date)
+        quantity_rows = stored[0] + 1 if len(stored) else len(dates)
+        
+        region_data = pd.DataFrame({'Date': dates[:quantity_rows]})
+        region_data['Vaccinated'] = decode_ints(columns[1][:quantity_rows])
+        region_data['FullyVaccinated'] = decode_ints(columns[2][:quantity_rows])
+        if header.find('ревакцинация') >= 0:
+            region_data['Revaccinated'] = decode_ints(columns[3][:quantity_rows])
+        else:
+            region_data['Revaccinated'] = 0
             
-        region_data = pd.DataFrame(data, columns=['Date', 'Vaccinated', 'FullyVaccinated', 'Revaccinated'])
         region_data = self._clear_duplicated_values(region_data)
         region_data = self._delete_empty_rows(region_data)
+        region_data = region_data[region_data.Date > last_date]
+        region_data = region_data.drop_duplicates(subset='Date', keep='first').reset_index(drop=True) #the newest row of a date
         return region_data.astype({'Date':'int32', 'Vaccinated':'uint32', 'FullyVaccinated':'uint32', 'Revaccinated':'uint32'})
     
     def _clear_duplicated_values(self, region_data):
+        #rows go from new to old, a value repeating the previous day isn't a new value
         for column in ('Vaccinated', 'FullyVaccinated', 'Revaccinated'):
-            prev_value = None
-            for index in reversed(region_data.index):
-                value = region_data.loc[index][column]
-                if prev_value is not None and value == prev_value:
-                    region_data[column].loc[index] = 0
-                prev_value = value
+            values = region_data[column].values.copy()
+            duplicated = np.zeros(len(values), dtype=bool)
+            duplicated[:-1] = values[:-1] == values[1:]
+            values[duplicated] = 0
+            region_data[column] = values
         return region_data
     
     def _delete_empty_rows(self, region_data):
-        empty_rows = []
-        for index in region_data.index:
-            row = region_data.loc[index]
-            if row.Vaccinated + row.FullyVaccinated + row.Revaccinated == 0:
-                empty_rows.append(index)
-        region_data = region_data.drop(empty_rows, axis=0) 
-        return region_data.reset_index(drop=True)       
-        
-    def _download(self, url): 
+        values = region_data[['Vaccinated', 'FullyVaccinated', 'Revaccinated']].values
+        empty_rows = (values == 0).all(axis=1)
+        return region_data[~empty_rows].reset_index(drop=True)
+        
+    def _get_page(self, url):
+        response = self._download(url, self.page_cache.request_headers(url))
+        if response.status_code == 304:
+            return self.page_cache.load(url), False
+        
+        self.page_cache.save(url, response)
+        return response.text, True
+        
+    def _download(self, url, headers=None): 
+        session = self._get_session()
+        rate_limiter = self._get_rate_limiter(url)
         for _ in range(self.quantity_attempts):
+            rate_limiter.acquire()
             try:
-                data = requests.get(url, timeout=self.connection_time_out, headers=self.headers)
-                if data.status_code == 200:
-                    time.sleep(self.time_out_after_success)
+                data = session.get(url, timeout=self.connection_time_out, headers=headers)
+                if data.status_code in (200, 304):
                     break
                 else:
                     time.sleep(self.time_out_after_error)
@@ -188,26 +510,57 @@ class VaccinationData:
             raise RuntimeError('Failed to load page:' + url)
         
         return data
+    
+    def _get_session(self):
+        with self.session_lock:
+            if self.session is None:
+                import requests
+                self.session = requests.Session()
+                self.session.headers.update(self.headers)
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.quantity_workers)
+                self.session.mount('https://', adapter)
+                self.session.mount('http://', adapter)
+            return self.session
+    
+    def _get_rate_limiter(self, url):
+        host = urlparse(url).netloc
+        with self.rate_limiters_lock:
+            if host not in self.rate_limiters:
+                self.rate_limiters[host] = RateLimiter(self.requests_per_second, self.quantity_workers)
+            return self.rate_limiters[host]
          
          
 class MortalityReader:
-    def __init__(self, month_date):
+    def __init__(self, month_date, cache=None):
         self.month_date = month_date
         self.file_name = self._get_file_name()
         self.death_significance_limit = 1000  
-
+        self.cache = cache
+        
     def read(self):
+        #the parsed file is taken from the cache, while the file is not changed,
+        #the cache keeps the names of the file, so changes of RUSSIAN_REGIONS apply without parsing again
+        data = None if self.cache is None else self.cache.load(self.file_name)
+        if data is None:
+            data = self._parse()
+            if self.cache is not None:
+                self.cache.save(self.file_name, data)
+        
+        data['Region'] = RUSSIAN_REGIONS.replace(data.Region)
+        data.insert(1, 'Date', self.month_date)
+        return data
+
+    def _parse(self):
         names = ['Region', 'Mortality_2021', 'Mortality_2020']
-        data = pd.read_csv(self.file_name, sep=';', header=0, names=names, usecols=[0, 5, 6])
+        dtype = {'Region': str, 'Mortality_2021': 'float64', 'Mortality_2020': 'float64'}
+        data = pd.read_csv(self.file_name, sep=';', header=0, names=names, usecols=[0, 5, 6], dtype=dtype)
         
         data = self._delete_bad_rows(data)
-        data['Date'] = self.month_date
         data['K_mortality'] = data.Mortality_2021 / data.Mortality_2020
-        return data.drop(['Mortality_2021', 'Mortality_2020'], axis=1)
+        return data.drop(['Mortality_2021', 'Mortality_2020'], axis=1).reset_index(drop=True)
     
     def _get_file_name(self): 
-        month = self.month_date.month
-        year = self.month_date.year
+        year, month = split_months(self.month_date)
         
         if month < 10:
             month_str = '0' + str(month)
@@ -227,207 +580,141 @@ class MortalityReader:
     def _delete_bad_rows(self, data):   
         data = data[data.Mortality_2020 > self.death_significance_limit]
         
-        bad_rows = []
-        for index in data.index:
-            row = data.loc[index]
-            region = row.Region
-            if region.startswith(' '):
-                bad_rows.append(index)
-                
-            elif region.find('без автономии') >= 0:
-                bad_rows.append(index)
-                
-        return data.drop(bad_rows, axis=0)
+        #rows of parts of regions begin with a space, rows without a name are bad too
+        bad_rows = data.Region.str.startswith(' ', na=True)
+        bad_rows |= data.Region.str.contains('без автономии', regex=False, na=True)
+        return data[~bad_rows]
 
 
 class Analyzator:
     def __init__(self, analyzed_months):
         self.analyzed_months = analyzed_months
+        self.period_disease = PERIOD_DISEASE
+        self.delay_vaccination_data = DELAY_VACCINATION_DATA
+        self.build_half_regions = BUILD_HALF_REIONS
+        self.max_part_unvaccined = 1 #regions with larger parts of unvaccinated are left out
+        self.file_cache = FileCache(FOLDER + 'cache/', PARSER_VERSION)
+        
+        #regions go from the largest, so the first half of them is the larger half
         self.population = self._get_population()
+        self.region_index = RegionIndex(self.population.Region)
+        self.population_values = self.region_index.align(self.population.Region, self.population.Population)
+        larger_half = np.arange(len(self.population)) < len(self.population) * 0.5
+        self.larger_half = self.region_index.align(self.population.Region, larger_half) == 1
+        self.mortality = {}
+        self.interpolators = {}
         
         downloader = VaccinationData()
         self.vaccination = downloader.get()
-        self.vaccination = self.vaccination.reset_index(drop=True)
+        self.vaccination.rename_regions(RUSSIAN_REGIONS.get)
         
         self.plot_density_of_corrections = False
         self.statistic_corrections = []
         self.permissible_interpolate_correction = 0.1
         self.permissible_extrapolate_correction = 0.05
         
-    def analyze(self):
+    def analyze(self, progress=print, n_boot=Statistics.N_BOOT):
+        points = self._get_points(progress)
+        progress('Counting of regressions...')
+        stats, bands = Statistics.regress(points, ['Month', 'Indicator'], 'PartUnvaccined', 'K_mortality', n_boot)
+        tables = {'regression': stats, 'points': points, 'bands': bands}
+        if self.plot_density_of_corrections:
+            tables['corrections'] = pd.DataFrame({'Correction': self.statistic_corrections})
+        return tables
+    
+    def prepare(self, grid):
+        #everything, which does not depend on the parameters of the grid, is loaded before the workers of Sweep
         for month in self.analyzed_months:
-            reader = MortalityReader(month)
-            mortality = reader.read()
+            self._get_mortality(month)
+        for indicator in INDICATORS:
+            self._get_interpolator(indicator)
+    
+    def regress(self, n_boot=Statistics.N_BOOT):
+        points = self._get_points(lambda text: None)
+        stats, _ = Statistics.regress(points, ['Month', 'Indicator'], 'PartUnvaccined', 'K_mortality', n_boot)
+        return stats
+        
+    def _get_points(self, progress):
+        vaccination = {indicator: self._get_vaccination_for_months(indicator) for indicator in INDICATORS}
+        regression = []
+        for month in self.analyzed_months:
+            progress('Analysis of ' + str(month))
+            mortality = self._get_mortality(month)
             
-            fig = VaccinationFigure(month, nrows=2, ncolumns=1)
-            for indicator in ('Vaccinated', 'FullyVaccinated'):
-                month_vaccination = self._get_vaccination_for_month(month, indicator)
-                all_data = self._merge_all_dataframes(mortality, month_vaccination,  indicator)
-                # all_data = all_data[all_data.PartUnvaccined<0.75]
+            for indicator in INDICATORS:
+                month_vaccination = vaccination[indicator][month]
+                all_data = self._join_regions(mortality, month_vaccination)
                 
-                x = all_data.PartUnvaccined
-                y = all_data.K_mortality
-                fig.add_scatter(x, y, indicator)
-        
-        self._plot_density_of_corrections()
-        plt.show()
-
-    def _plot_density_of_corrections(self):
-        if not self.plot_density_of_corrections:
-            return
-        
-        fig = plt.figure()
-        fig.suptitle('Density corrections of value', fontsize=14)
+                all_data.insert(0, 'Month', month)
+                all_data.insert(1, 'Indicator', indicator)
+                regression.append(all_data)
         
-        ax = fig.add_subplot(1, 1, 1)
-        ax.set_xlabel('Part of correction', fontsize=12)
-        ax.set_ylabel('Density of probability', fontsize=12)
-
-        corrections = pd.Series(self.statistic_corrections)
-        corrections = corrections[corrections < 1]
-        sns.distplot(corrections, bins=100, ax=ax, color='k')
+        return pd.concat(regression, ignore_index=True)
         
     def _get_population(self):
         file_name = FOLDER + 'Popul2021_Site-1.csv'
-        data = pd.read_csv(file_name, sep=';', header=0, names=['Region', 'Population'], usecols=(0,1))
+        data = self.file_cache.load(file_name)
+        if data is None:
+            data = self._read_population(file_name)
+            self.file_cache.save(file_name, data)
         
-        #delete aggregated regions
-        removed_rows = []
-        for index in data.index:
-            if data.loc[index].Region.find(' округ') >= 0:
-                removed_rows.append(index)
-        data = data.drop(removed_rows, axis=0)
-            
-        if BUILD_HALF_REIONS:
-            data = data.sort_values(by='Population', ascending=False)
-            data = data.reset_index(drop=True)
-            middle = len(data) * 0.5
-            data = data[data.index<middle]
-            
+        #names of the file are cached, as in MortalityReader
+        data['Region'] = RUSSIAN_REGIONS.replace(data.Region)
         return data
-      
-    def _get_vaccination_for_month(self, month, column):
-        def get_date(date_int):
-                date_str = str(date_int)
-                date_str = date_str[:4] + '-' + date_str[4:6] + '-' + date_str[6:]
-                return np.datetime64(date_str, 'D')
-        
-        shift = DELAY_VACCINATION_DATA - PERIOD_DISEASE
-        border_date = month + datetime.timedelta(days=shift)
-        border_date = int(border_date.strftime('%Y%m%d'))
-        
-        vaccination = self.vaccination    
-        vaccination_for_month = {}
-        regions = set(self.vaccination.Region)
-        for region in regions:
-            region_data = vaccination[(vaccination.Region==region) & (vaccination[column] > 0)]
-            region_data = region_data.set_index('Date')
-            if not region_data.index.is_monotonic_decreasing:
-                region_data.sort_index(ascending=False)
-            
-            start_row = region_data.iloc[0]
-            last_row = region_data.iloc[-1]
-            if border_date > start_row.name:
-                first_row = start_row
-                second_row = region_data.iloc[1]
-                
-            elif border_date < last_row.name:
-                first_row = region_data.iloc[-2]
-                second_row = last_row
-                
-            else:
-                first_pos = region_data.index.get_loc(border_date, method='ffill')
-                second_pos = region_data.index.get_loc(border_date, method='bfill')
-                first_row = region_data.iloc[first_pos]
-                second_row = region_data.iloc[second_pos]
-            
-            derivative_period = np.busday_count(get_date(second_row.name), get_date(first_row.name))
-            shift_period = np.busday_count(get_date(second_row.name), get_date(border_date))
-            if derivative_period == 0 or shift_period == 0:
-                value = second_row[column]
-                
-            else:
-                difference = first_row[column] - second_row[column]
-                derivative = difference / derivative_period
-                value = second_row[column] + derivative * shift_period
-                
-                #positive value mean interpolation, negative- extrapolation
-                delta_first = first_row[column] - value 
-                delta_second = value - second_row[column]
-                if abs(delta_first) < abs(delta_second):
-                    part = delta_first / first_row[column]
-                else:
-                    part = delta_second / second_row[column]
-                    
-                if self.plot_density_of_corrections:
-                    self.statistic_corrections.append(part)
-                    
-                if part > self.permissible_interpolate_correction or -part > self.permissible_extrapolate_correction:
-                    #too big corrections
-                    continue
-                
-            if value < 0:
-                value = 0
-            
-            vaccination_for_month[region] = np.uint32(value)
-        return vaccination_for_month
     
-    def _merge_all_dataframes(self, mortality, month_vaccination,  column):
-        def replace_regions(df):
-            for index in df.index:
-                row = df.loc[index]
-                
-                region = row.Region
-                pos = region.find('(')
-                if pos >= 0:
-                    region = region[:pos]
-                    
-                region = region.replace('автономный округ', '')
-                region = region.replace('автономная область', '')
-                region = region.replace('авт.округ', '')
-                region = region.replace('авт.область', '')
-                region = region.replace('Республика', '')
-                region = region.replace('область', '')
-                region = region.replace('край', '')
-                region = region.replace('обл.', '')
-                region = region.replace('АО', '')
-                region = region.replace('г.', '')
-                region = region.strip()
-                
-                if region == 'Чувашская':
-                    region = 'Чувашия'
-                    
-                elif region == 'Ханты-Мансийский -Югра':
-                    region = 'Ханты-Мансийский'
-                    
-                elif region == 'Удмуртская':
-                    region = 'Удмуртия'
-                    
-                elif region == 'Hенецкий':
-                    region = 'Ненецкий'
-                    
-                elif region == 'Ямало-Hенецкий':
-                    region = 'Ямало-Ненецкий'
-                    
-                elif region == 'Hижегородская':
-                    region = 'Нижегородская'
-                    
-                df['Region'].loc[index] = region
-            return df
+    def _read_population(self, file_name):
+        dtype = {'Region': str, 'Population': 'float64'}
+        data = pd.read_csv(file_name, sep=';', header=0, names=['Region', 'Population'], usecols=(0,1), dtype=dtype)
         
-        population = replace_regions(self.population)
-        mortality = replace_regions(mortality)  
-          
-        vaccination = pd.DataFrame({'Region': month_vaccination.keys(), column: month_vaccination.values()})
-        vaccination = replace_regions(vaccination)
+        #delete aggregated regions
+        data = data[~data.Region.str.contains(' округ', regex=False, na=True)]
         
-        all_data = pd.merge(mortality, population, on='Region')
-        all_data = pd.merge(all_data, vaccination, on='Region')
+        data = data.sort_values(by='Population', ascending=False)
+        return data.reset_index(drop=True)
+      
+    def _get_vaccination_for_months(self, column):
+        border_dates = list(self._get_border_date(self.analyzed_months))
+        vaccination = self._get_interpolator(column).interpolate(border_dates)
         
-        all_data['PartUnvaccined'] = 1 - all_data[column] / all_data.Population
-        all_data = all_data[(all_data.PartUnvaccined<1) & (all_data.K_mortality>0)]
-        all_data = all_data.drop(['Date', 'Region', column, 'Population'], axis=1)
-        return all_data
+        corrections = vaccination.Correction
+        if self.plot_density_of_corrections:
+            self.statistic_corrections.extend(corrections.dropna())
+            
+        #too big corrections
+        rejected = (corrections > self.permissible_interpolate_correction) | (-corrections > self.permissible_extrapolate_correction)
+        vaccination = vaccination[~rejected]
+        
+        vaccination_for_months = {}
+        for month, border_date in zip(self.analyzed_months, border_dates):
+            month_vaccination = vaccination[vaccination.Date == border_date]
+            vaccination_for_months[month] = self.region_index.align(month_vaccination.Region, month_vaccination[column])
+        return vaccination_for_months
+    
+    def _get_interpolator(self, column):
+        if column not in self.interpolators:
+            self.interpolators[column] = VaccinationInterpolator(self.vaccination, column)
+        return self.interpolators[column]
+    
+    def _get_border_date(self, months):
+        #dates as ints like 20211026, months can be an array
+        shift = self.delay_vaccination_data - self.period_disease
+        border_dates = add_months(months, 0) + np.timedelta64(shift, 'D')
+        return datetime64_to_int(border_dates)
+    
+    def _get_mortality(self, month):
+        if month not in self.mortality:
+            reader = MortalityReader(month, self.file_cache)
+            mortality = reader.read()
+            self.mortality[month] = self.region_index.align(mortality.Region, mortality.K_mortality)
+        return self.mortality[month]
+    
+    def _join_regions(self, mortality, month_vaccination):
+        #all arrays are indexed by the region id, missing regions are NaN
+        part_unvaccined = 1 - month_vaccination / self.population_values
+        valid = (part_unvaccined < self.max_part_unvaccined) & (mortality > 0)
+        if self.build_half_regions:
+            valid &= self.larger_half
+        return pd.DataFrame({'K_mortality': mortality[valid], 'PartUnvaccined': part_unvaccined[valid]})
     
     
 class VaccinationFigure:
@@ -437,41 +724,36 @@ class VaccinationFigure:
         self.ncolumns = ncolumns
         self.number_picture = 1
         
+        import seaborn as sns
+        from matplotlib import pyplot as plt
         self.fig = plt.figure()
         self.fig.suptitle(self._title(), fontsize=14)
         sns.set_style('darkgrid')
         
-    def add_scatter(self, x, y, indicator):
+    def add_scatter(self, x, y, stats, band, indicator):
+        #stats and band are counted by Statistics.regress, only drawing is left here
         ax = self.fig.add_subplot(self.nrows, self.ncolumns, self.number_picture)
         self.number_picture += 1
         
-        # ax.scatter(x, y)
-        sns.regplot(x, y)
+        ax.scatter(x, y)
         ax.set_xlabel(self._xlabel(indicator), fontsize=12)
         ax.set_ylabel(self._ylabel(indicator), fontsize=12)
         
-        #plot trendline    
-        z = np.polyfit(x, y, 1)
-        p = np.poly1d(z)
-        ax.plot(x, p(x), "r-")
+        #plot trendline with its confidence band
+        ax.plot(band.X, band.Y, "r-")
+        if band.Low.notnull().all():
+            ax.fill_between(band.X, band.Low, band.High, color='r', alpha=0.15)
         
         x_text = np.min(x)
         y_text = 1.025 * np.mean(y)
-        equation_text = 'y = ' + str(round(z[0], 2)) + 'x '
-        equation_text += '+' if z[1]>0 else ''
-        equation_text += str(round(z[1], 2))
+        equation_text = 'y = ' + str(round(stats.Slope, 2)) + 'x '
+        equation_text += '+' if stats.Intercept>0 else ''
+        equation_text += str(round(stats.Intercept, 2))
+        equation_text += '\nr = ' + str(round(stats.R, 2)) + ', p = ' + str(round(stats.P_value, 4))
         ax.text(x_text, y_text, equation_text, fontsize=10)
 
     def _title(self):
-        month = self.month_date.month
-        if month == 10:
-            month_name = 'Октябрь'
-        elif month == 11:
-            month_name = 'Ноябрь'
-        elif month == 12:
-            month_name = 'Декабрь'
-            
-        return month_name + ' 2021г'
+        return get_month_name(self.month_date)
 
     def _xlabel(self, indicator):
         if indicator == 'Vaccinated':
@@ -483,37 +765,104 @@ class VaccinationFigure:
         return 'Избыточная смертность'
 
 
-def analyze():
-    analyzed_months = [datetime.date(2021, month, 1) for month in (10, 11, 12)]
-    analyzotor = Analyzator(analyzed_months)
-    analyzotor.analyze()  
-    print('Operation successfully completed!')
-        
-def build_window():       
-    window = QtWidgets.QWidget()
-    window.resize(600, 100)
+def plot_density_of_corrections(corrections):
+    import seaborn as sns
+    from matplotlib import pyplot as plt
+    fig = plt.figure()
+    fig.suptitle('Density corrections of value', fontsize=14)
     
-    label = QtWidgets.QLabel()
-    label.setText('Анализ избыточной смертности в зависимости от доли невакцинированного населения в России')
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlabel('Part of correction', fontsize=12)
+    ax.set_ylabel('Density of probability', fontsize=12)
 
-    myFont=QtGui.QFont()
-    myFont.setPointSize(14)
-    myFont.setBold(True)
-    label.setFont(myFont)
-
-    button = QtWidgets.QCommandLinkButton("Analyze")
-    button.clicked.connect(analyze)
+    corrections = corrections[corrections < 1]
+    sns.distplot(corrections, bins=100, ax=ax, color='k')
     
-    vbox = QtWidgets.QVBoxLayout()
-    vbox.addWidget(label)
-    vbox.addWidget(button)
-    window.setLayout(vbox)
-    return window
+def plot_rolling(rolling):
+    #slope and correlation of the regressions over ROLLING_MONTHS months ending at every month
+    import seaborn as sns
+    from matplotlib import pyplot as plt
+    fig = plt.figure()
+    fig.suptitle('Регрессии по ' + str(ROLLING_MONTHS) + ' мес.', fontsize=14)
+    sns.set_style('darkgrid')
     
-if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
-    window = build_window()    
-    window.show()
-    sys.exit(app.exec_())    
+    slope_ax = fig.add_subplot(2, 1, 1)
+    slope_ax.set_ylabel('Наклон', fontsize=12)
+    r_ax = fig.add_subplot(2, 1, 2, sharex=slope_ax)
+    r_ax.set_ylabel('Коэффициент корреляции', fontsize=12)
+    
+    for indicator in INDICATORS:
+        stats = rolling[rolling.Indicator==indicator]
+        slope_ax.plot(stats.Month, stats.Slope, label=indicator)
+        if stats.Slope_Low.notnull().all():
+            slope_ax.fill_between(stats.Month, stats.Slope_Low, stats.Slope_High, alpha=0.15)
+        r_ax.plot(stats.Month, stats.R, label=indicator)
+    slope_ax.legend()
+    fig.autofmt_xdate()
     
-        
\ No newline at end of file
+def get_analyzed_months():
+    return add_months(np.datetime64('2021-10'), np.arange(3))
+
+def get_available_months():
+    #all months of the files of mortality in FOLDER
+    months = []
+    for file_name in glob.glob(FOLDER + 'edn*.csv'):
+        match = re.search(r'edn(\d\d)_(\d{4})(ut)?\.csv$', file_name)
+        if match:
+            months.append(np.datetime64(match.group(2) + '-' + match.group(1), 'D'))
+    return np.unique(np.array(months, dtype='datetime64[D]'))
+
+def analyze(progress=print, n_boot=Statistics.N_BOOT):
+    progress('Loading of population and vaccination...')
+    analyzotor = Analyzator(get_analyzed_months())
+    return analyzotor.analyze(progress, n_boot)
+
+def series(progress=print, n_boot=Statistics.N_BOOT):
+    #regressions of every available month and rolling regressions over ROLLING_MONTHS months
+    progress('Loading of population and vaccination...')
+    analyzotor = Analyzator(get_available_months())
+    tables = analyzotor.analyze(progress, n_boot)
+    progress('Counting of rolling regressions...')
+    tables['rolling'] = Statistics.rolling(tables['points'], ['Indicator'], 'Month', 'PartUnvaccined', 'K_mortality', ROLLING_MONTHS, n_boot)
+    return tables
+
+def sweep(progress=print, n_boot=Statistics.N_BOOT, quantity_processes=None):
+    progress('Loading of population and vaccination...')
+    analyzotor = Analyzator(get_analyzed_months())
+    return {'sweep': Sweep.run(analyzotor, SWEEP_GRID, n_boot, quantity_processes, progress)}
+
+def plot(tables):
+    if 'regression' in tables:
+        for month, month_stats in tables['regression'].groupby('Month', sort=True):
+            fig = VaccinationFigure(month, nrows=2, ncolumns=1)
+            for indicator in INDICATORS:
+                stats = month_stats[month_stats.Indicator==indicator]
+                if stats.empty:
+                    #no vaccination data of the month
+                    continue
+                stats = stats.iloc[0]
+                points = tables['points']
+                points = points[(points.Month==month) & (points.Indicator==indicator)]
+                band = tables['bands']
+                band = band[(band.Month==month) & (band.Indicator==indicator)]
+                fig.add_scatter(points.PartUnvaccined, points.K_mortality, stats, band, indicator)
+            
+    if 'rolling' in tables:
+        plot_rolling(tables['rolling'])
+    if 'corrections' in tables:
+        plot_density_of_corrections(tables['corrections'].Correction)
+
+def split(tables):
+    #a figure for every month, one for rolling regressions and one for corrections
+    parts = []
+    for month in tables['regression'].Month.unique():
+        part = {name: tables[name][tables[name].Month==month] for name in ('regression', 'points', 'bands')}
+        parts.append((str(month)[:7], part))
+    if 'rolling' in tables:
+        parts.append(('rolling', {'rolling': tables['rolling']}))
+    if 'corrections' in tables:
+        parts.append(('corrections', {'corrections': tables['corrections']}))
+    return parts
+    
+if __name__ == '__main__':
+    Application.run(TITLE, 'russia', analyze, plot, split, sweep, series)
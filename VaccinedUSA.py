@@ -1,11 +1,11 @@
 import warnings
-import sys
 import numpy as np
 import pandas as pd
-import seaborn as sns
-from matplotlib import pyplot as plt
-from PyQt5 import QtGui, QtWidgets
 from enum import Enum
+import Application
+from Months import add_months, get_month_range, get_month_name
+import Statistics
+import Sweep
 
 
 warnings.simplefilter(action='ignore')
@@ -15,6 +15,13 @@ PERIOD_DISEASE = 10
 DELAY_VACCINATION_DATA = 5
 USE_PREDICTED_MORTALITY = True
 BUILD_HALF_REIONS = True
+PROCESSING = {True: 'Predicted (weighted)', False: 'Unweighted'} #by USE_PREDICTED_MORTALITY
+ROLLING_MONTHS = 3 #months in every regression of the series
+AGE_GROUPS_ABOVE65 = ('65-74 years', '75-84 years', '85 years and older')
+SWEEP_GRID = {'period_disease': range(1, 31), 'delay_vaccination_data': range(10),
+              'build_half_regions': (True, False), 'use_predicted_mortality': (True, False),
+              'min_k_mortality': (0.1, 0.3, 0.5)}
+TITLE = 'Анализ избыточной смертности в зависимости от доли невакцинированного населения в США'
 
 
 class AgeGroups(Enum):
@@ -23,67 +30,222 @@ class AgeGroups(Enum):
     under65 = 'Under 65 years'
     
     
-class Analizator:
-    def __init__(self, months):
-        self.months = months
+class MortalityCube:
+    #monthly deaths of the weekly file, every month, age group and type of processing is counted only once
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.weekly = None
+        self.cubes = {}
+        self.deaths = {}
+        
+    def get(self, month, age_group, processing):
+        key = (np.datetime64(month, 'D'), age_group, processing)
+        if key not in self.deaths:
+            cube = self._get_cube(processing)
+            try:
+                deaths = cube.loc[(age_group.name, pd.Timestamp(month))]
+            except KeyError:
+                #no weeks in the month
+                deaths = pd.Series([], index=pd.Index([], name='State'), name='Deaths', dtype='float64')
+            self.deaths[key] = deaths.reset_index()
+        return self.deaths[key]
+    
+    def get_complete_months(self, processing):
+        #months, all days of which are covered by the weeks of the file
+        weekly = self._read_weekly()
+        end_week = weekly.EndWeek[weekly.TypeProcessing == processing].values.astype('datetime64[D]')
+        if len(end_week) == 0:
+            return np.array([], dtype='datetime64[D]')
+        first_day = end_week.min() - np.timedelta64(6, 'D')
+        last_day = end_week.max()
+        months = get_month_range(first_day, last_day)
+        return months[(months >= first_day) & (add_months(months, 1) - np.timedelta64(1, 'D') <= last_day)]
+    
+    def _get_cube(self, processing):
+        if processing not in self.cubes:
+            weekly = self._read_weekly()
+            self.cubes[processing] = self._count_monthly_mortality(weekly[weekly.TypeProcessing == processing])
+        return self.cubes[processing]
+        
+    def _read_weekly(self):
+        if self.weekly is None:
+            names = ['EndWeek', 'State', 'AgeGroup', 'Deaths', 'TypeProcessing']
+            usecols = (1, 2, 5, 6, 8)
+            data = pd.read_csv(self.file_name, header=0, names=names, usecols=usecols, parse_dates=['EndWeek'])
+            data['Above65'] = data.AgeGroup.isin(AGE_GROUPS_ABOVE65)
+            self.weekly = data.drop('AgeGroup', axis=1)
+        return self.weekly
+    
+    def _count_monthly_mortality(self, data):
+        #a week crossing the border of months is split between them by the quantity of its days in every month
+        end_week = data.EndWeek.values.astype('datetime64[D]')
+        start_week = end_week - np.timedelta64(6, 'D')
+        end_month = end_week.astype('datetime64[M]')
+        start_month = start_week.astype('datetime64[M]')
+        deaths = data.Deaths.values.astype('float64')
+        
+        split = start_month != end_month
+        days_in_end_month = (end_week - end_month.astype('datetime64[D]')).astype('int64') + 1
+        end_deaths = np.where(split, np.round(days_in_end_month / 7 * deaths), deaths)
+        start_deaths = np.round((7 - days_in_end_month[split]) / 7 * deaths[split])
+        
+        parts = pd.DataFrame({'Month': np.concatenate([end_month, start_month[split]]).astype('datetime64[D]'),
+                              'Above65': np.concatenate([data.Above65.values, data.Above65.values[split]]),
+                              'State': np.concatenate([data.State.values, data.State.values[split]]),
+                              'Deaths': np.concatenate([end_deaths, start_deaths])})
+        by_ages = parts.groupby(['Month', 'Above65', 'State']).Deaths.sum()
         
-    def analyze(self):
-        vaccination = self._read_vaccination()
-        vaccination = self._count_unvaccination(vaccination)
+        #deaths of every state in every month and age group
+        cube = {AgeGroups.all.name: by_ages.groupby(level=['Month', 'State']).sum()}
+        for age_group, above65 in ((AgeGroups.above65, True), (AgeGroups.under65, False)):
+            selected = by_ages[by_ages.index.get_level_values('Above65') == above65]
+            cube[age_group.name] = selected.droplevel('Above65')
+        return pd.concat(cube, names=['AgeGroup'])
+    
+    
+class Analizator:
+    def __init__(self, months=None):
+        #months=None analyzes all available months
+        self.chunk_size = 100000 #rows of the vaccination file in memory at once
+        self.mortality = MortalityCube(FOLDER + 'Weekly_Counts_of_Deaths_by_Jurisdiction_and_Age.csv')
+        self.vaccination = None
+        self.month_vaccination = {}
+        self.k_mortality = {}
+        self.period_disease = PERIOD_DISEASE
+        self.delay_vaccination_data = DELAY_VACCINATION_DATA
+        self.build_half_regions = BUILD_HALF_REIONS
+        self.use_predicted_mortality = USE_PREDICTED_MORTALITY
+        self.min_k_mortality = 0.3 #smaller ratios are errors of data
+        self.months = self.get_available_months() if months is None else months
         
-        mortality = self._read_mortality()
+    def analyze(self, progress=print, n_boot=Statistics.N_BOOT):
+        progress('Loading of vaccination and mortality...')
+        self.prepare({})
+        points = self._get_points(progress)
+        progress('Counting of regressions...')
+        stats, bands = Statistics.regress(points, ['Month', 'AgeGroup', 'Dose'], 'PartUnvaccined', 'K_Mortality', n_boot)
+        return {'regression': stats, 'points': points, 'bands': bands}
+    
+    def prepare(self, grid):
+        #vaccination at the border dates of all lags of the grid and mortality of all its types of processing
+        #are loaded before the workers of Sweep
+        periods = grid.get('period_disease', [self.period_disease])
+        delays = grid.get('delay_vaccination_data', [self.delay_vaccination_data])
+        shifts = sorted({period - delay for period in periods for delay in delays})
+        border_dates = [month - np.timedelta64(shift, 'D') for month in self.months for shift in shifts]
+        self.vaccination = self._count_unvaccination(self._read_vaccination(border_dates))
+        self.month_vaccination = {}
+        for border_date in border_dates:
+            for build_half_regions in grid.get('build_half_regions', [self.build_half_regions]):
+                self._get_month_vaccination(border_date, build_half_regions)
         
+        for use_predicted_mortality in grid.get('use_predicted_mortality', [self.use_predicted_mortality]):
+            for month in self.months:
+                for age_group in AgeGroups:
+                    self._get_k_mortality(month, age_group, PROCESSING[use_predicted_mortality])
+    
+    def get_available_months(self):
+        #complete months with the complete month of the previous year and vaccination at the border date
+        complete_months = self.mortality.get_complete_months(PROCESSING[self.use_predicted_mortality])
+        months = complete_months[np.isin(add_months(complete_months, -12), complete_months)]
+        vaccination_dates = self._read_vaccination_dates()
+        return months[np.isin(self._get_border_date(months), vaccination_dates)]
+    
+    def regress(self, n_boot=Statistics.N_BOOT):
+        points = self._get_points(lambda text: None)
+        stats, _ = Statistics.regress(points, ['Month', 'AgeGroup', 'Dose'], 'PartUnvaccined', 'K_Mortality', n_boot)
+        return stats
+    
+    def _get_points(self, progress):
+        processing = PROCESSING[self.use_predicted_mortality]
+        regression = {'Month': [], 'AgeGroup': [], 'Dose': [], 'PartUnvaccined': [], 'K_Mortality': []}
         for month in self.months:
-            days = PERIOD_DISEASE-DELAY_VACCINATION_DATA
-            border_date = month - np.timedelta64(days, 'D')
-            month_vaccination = vaccination[vaccination.Date==border_date]
-            
-            if BUILD_HALF_REIONS:
-                half = len(month_vaccination) * 0.5
-                month_vaccination = month_vaccination.sort_values(by='Population', ascending=False)
-                month_vaccination = month_vaccination.reset_index(drop=True)
-                month_vaccination = month_vaccination[month_vaccination.index<half]
+            progress('Analysis of ' + str(month))
+            month_vaccination = self._get_month_vaccination(self._get_border_date(month), self.build_half_regions)
             
-            figure = VaccinationFigure(month)
             for age_group in AgeGroups:
-                current_mortality = self._select_mortlality(mortality, month, age_group)
-        
-                previous_year_month = self._add_months(month, -12)
-                previous_mortality = self._select_mortlality(mortality, previous_year_month, age_group)
-        
-                suffixes=('_current_year', '_previous_year')
-                all_mortality = pd.merge(current_mortality, previous_mortality, on='State', suffixes=suffixes)
-                all_mortality['K_Mortality'] = all_mortality.Deaths_current_year / all_mortality.Deaths_previous_year
-                all_mortality = all_mortality.drop(['Deaths_current_year', 'Deaths_previous_year'], axis=1)
-                all_mortality = all_mortality[all_mortality.K_Mortality>0.3]
-                
-                data = pd.merge(month_vaccination, all_mortality, on='State')
+                #the same rows as the inner merge of month_vaccination with k_mortality on State,
+                #states without mortality get NaN, k_mortality is empty for months without weeks
+                k_mortality = self._get_k_mortality(month, age_group, processing)
+                k_mortality = k_mortality.reindex(month_vaccination.State.values).values
+                found = k_mortality > self.min_k_mortality
                 
                 if age_group == AgeGroups.all:
-                    x1 = data.FirstPart
-                    x2 = data.SecondPart
+                    columns = {'First': 'FirstPart', 'Second': 'SecondPart'}
                 elif age_group == AgeGroups.above65:
-                    x1 = data.First65PlusPart
-                    x2 = data.Second65PlusPart
+                    columns = {'First': 'First65PlusPart', 'Second': 'Second65PlusPart'}
                 else:
-                    x1 = data.First65MinusPart
-                    x2 = data.Second65MinusPart
+                    columns = {'First': 'First65MinusPart', 'Second': 'Second65MinusPart'}
                 
-                y1 = data.K_Mortality
-                y2 = data.K_Mortality
-                    
-                figure.add_scatters(x1, y1, x2, y2)
+                quantity = np.count_nonzero(found)
+                for dose, column in columns.items():
+                    regression['Month'].append(np.full(quantity, month))
+                    regression['AgeGroup'].append(np.full(quantity, age_group.name, dtype=object))
+                    regression['Dose'].append(np.full(quantity, dose, dtype=object))
+                    regression['PartUnvaccined'].append(month_vaccination[column].values[found])
+                    regression['K_Mortality'].append(k_mortality[found])
         
-        plt.show()
+        return pd.DataFrame({column: np.concatenate(values) for column, values in regression.items()})
+    
+    def _get_month_vaccination(self, border_date, build_half_regions):
+        key = (border_date, build_half_regions)
+        if key not in self.month_vaccination:
+            month_vaccination = self.vaccination[self.vaccination.Date==border_date]
+            month_vaccination = month_vaccination.astype({'State': object})
+            
+            if build_half_regions:
+                half = len(month_vaccination) * 0.5
+                month_vaccination = month_vaccination.sort_values(by='Population', ascending=False)
+                month_vaccination = month_vaccination.reset_index(drop=True)
+                month_vaccination = month_vaccination[month_vaccination.index<half]
+            self.month_vaccination[key] = month_vaccination
+        return self.month_vaccination[key]
+    
+    def _get_k_mortality(self, month, age_group, processing):
+        #ratio of deaths to the same month of the previous year by states
+        key = (month, age_group, processing)
+        if key not in self.k_mortality:
+            current_mortality = self.mortality.get(month, age_group, processing)
+            
+            previous_year_month = add_months(month, -12)
+            previous_mortality = self.mortality.get(previous_year_month, age_group, processing)
+            
+            suffixes=('_current_year', '_previous_year')
+            all_mortality = pd.merge(current_mortality, previous_mortality, on='State', suffixes=suffixes)
+            k_mortality = all_mortality.Deaths_current_year / all_mortality.Deaths_previous_year
+            self.k_mortality[key] = pd.Series(k_mortality.values, index=all_mortality.State, name='K_Mortality')
+        return self.k_mortality[key]
                 
-    def _read_vaccination(self):
+    def _get_border_date(self, month):
+        days = self.period_disease - self.delay_vaccination_data
+        return month - np.timedelta64(days, 'D')
+    
+    def _read_vaccination(self, border_dates):
+        #the file grows every day, so it is read by chunks and only the rows of the border dates are kept
         file_name = FOLDER + 'COVID-19_Vaccinations_in_the_United_States_Jurisdiction.csv'
         names = ['Date', 'State', 'First', 'FirstPct', 'First65Plus', 'First65PlusPct', 'Second', 'SecondPct', 'Second65Plus', 'Second65PlusPct']
         usecols = (0, 2, 25, 26, 31, 32, 33, 34, 39, 40)
-        data = pd.read_csv(file_name, header=0, names=names, usecols=usecols, parse_dates=[0])
-        data = data[data.State!='US']
+        #counts of states exceed 2**24, so only the percents are float32, the counts stay exact in float64
+        dtype = {name: 'float32' if name.endswith('Pct') else 'float64' for name in names[2:]}
+        dtype.update({'Date': str, 'State': str})
+        border_dates = pd.to_datetime(border_dates)
+        
+        chunks = []
+        for chunk in pd.read_csv(file_name, header=0, names=names, usecols=usecols, dtype=dtype, chunksize=self.chunk_size):
+            chunk['Date'] = pd.to_datetime(chunk.Date, format='%m/%d/%Y')
+            chunks.append(chunk[chunk.Date.isin(border_dates) & (chunk.State!='US')])
+        
+        data = pd.concat(chunks, ignore_index=True)
+        data['State'] = data.State.astype('category')
         return data.astype({'Date': 'datetime64[D]'})
     
+    def _read_vaccination_dates(self):
+        file_name = FOLDER + 'COVID-19_Vaccinations_in_the_United_States_Jurisdiction.csv'
+        dates = set()
+        for chunk in pd.read_csv(file_name, header=0, names=['Date'], usecols=(0,), dtype=str, chunksize=self.chunk_size):
+            dates.update(chunk.Date.unique())
+        return pd.to_datetime(sorted(dates), format='%m/%d/%Y').values.astype('datetime64[D]')
+    
     def _count_unvaccination(self, vaccination):
         mask = (vaccination.FirstPct>0) & (vaccination.First65PlusPct>0)
         vaccination = vaccination[mask]
@@ -110,80 +272,7 @@ class Analizator:
                            'Second65PlusPct', 'Population65Plus', 'Population65Minus', 'First65Minus', 'Second65Minus']
         return vaccination.drop(removed_columns, axis=1)
         
-    def _read_mortality(self):
-        file_name = FOLDER + 'Weekly_Counts_of_Deaths_by_Jurisdiction_and_Age.csv'
-        names = ['EndWeek', 'State', 'Above65', 'Deaths', 'TypeProcessing']
-        usecols = (1, 2, 5, 6, 8)
-        converters = {'Above65': lambda value: True if value in ('65-74 years', '75-84 years', '85 years and older') else False}
-        data = pd.read_csv(file_name, header=0, names=names, usecols=usecols, converters=converters, parse_dates=[1])
-        
-        if USE_PREDICTED_MORTALITY:
-            data = data[data.TypeProcessing == 'Predicted (weighted)']
-        else:
-            data = data[data.TypeProcessing == 'Unweighted']
-            
-        data = data.drop('TypeProcessing', axis=1)
-        
-        data = data.astype({'EndWeek': 'datetime64[D]'})
-        data['StartWeek'] = data.apply(lambda row: row.EndWeek - np.timedelta64(6, 'D'), axis=1)
-        return data
-    
-    def _select_mortlality(self, mortality, month, age_group):
-        if age_group == AgeGroups.all:
-            mask_age = [True] * len(mortality)
-        elif age_group == AgeGroups.above65:
-            mask_age = mortality.Above65==True
-        elif age_group == AgeGroups.under65:
-            mask_age = mortality.Above65==False
-        else:
-            raise RuntimeError('Wrong age group!')
-        
-        next_month = self._add_months(month, 1)
-        mortality = mortality[(mortality.EndWeek>=month) & (mortality.StartWeek<next_month) & (mask_age)]
-        mortality = mortality.drop('Above65', axis=1)
-        
-        #correct uncomplete weeks
-        day = np.timedelta64(1, 'D')
-        week = np.timedelta64(7, 'D')
-        for index in mortality.index:
-            row = mortality.loc[index]
-            if row.StartWeek < month:
-                K = (row.EndWeek - month + day) / week 
-                mortality.loc[index, 'Deaths'] = np.round(K * row.Deaths)
-                
-            elif row.EndWeek >= next_month:
-                K = (next_month - row.StartWeek) / week
-                mortality.loc[index, 'Deaths'] = np.round(K * row.Deaths)
-        
-        grouped = mortality.groupby('State')
-        mortality = grouped.sum()
-        mortality = mortality.reset_index()
-        return mortality  
-    
-    def _add_months(self, current_month, quantity):
-        year_int = current_month.astype(object).year
-        month_int = current_month.astype(object).month
-        
-        year_int += quantity // 12
-        month_int += quantity % 12
-        
-        if month_int <= 0:
-            year_int -= 1
-            month_int += 12
-            
-        elif month_int > 12:
-            year_int += 1
-            month_int -= 12
-        
-        if month_int < 10:
-            month_str = '0' + str(month_int)    
-        else:
-            month_str = str(month_int)
-        
-        year_str = str(year_int)
-        return np.datetime64(year_str + '-' + month_str, 'D')        
-            
-            
+
 class VaccinationFigure:
     def __init__(self, month_date):
         self.month_date = month_date.astype(object) #convert to Python datetime
@@ -191,49 +280,38 @@ class VaccinationFigure:
         self.ncolumns = 2
         self.number_row = 0
         
+        import seaborn as sns
+        from matplotlib import pyplot as plt
         self.fig = plt.figure()
         self.fig.suptitle(self._title(), fontsize=14)
         sns.set_style('darkgrid')
         
-    def add_scatters(self, x1, y1, x2, y2):
-        for number_column in range(2):
-            if number_column == 0:
-                x = x1
-                y = y1
-            else:
-                x = x2
-                y = y2
-            
+    def add_scatters(self, panels):
+        #a panel is (x, y, stats, band) of the first and then the second dose, the regressions are counted by Statistics.regress
+        for number_column, (x, y, stats, band) in enumerate(panels):
             number_picture = 2 * self.number_row + number_column + 1 
             ax = self.fig.add_subplot(self.nrows, self.ncolumns, number_picture)
             
-            sns.regplot(x, y)
+            ax.scatter(x, y)
             ax.set_xlabel(self._xlabel(number_column), fontsize=10)
             ax.set_ylabel(self._ylabel(number_column), fontsize=10)
             
-            #plot trendline    
-            z = np.polyfit(x, y, 1)
-            p = np.poly1d(z)
-            ax.plot(x, p(x), "r-")
+            #plot trendline with its confidence band
+            ax.plot(band.X, band.Y, "r-")
+            if band.Low.notnull().all():
+                ax.fill_between(band.X, band.Low, band.High, color='r', alpha=0.15)
             
             x_text = np.min(x)
             y_text = 1.025 * np.mean(y)
-            equation_text = 'y = ' + str(round(z[0], 2)) + 'x '
-            equation_text += '+' if z[1]>0 else ''
-            equation_text += str(round(z[1], 2))
+            equation_text = 'y = ' + str(round(stats.Slope, 2)) + 'x '
+            equation_text += '+' if stats.Intercept>0 else ''
+            equation_text += str(round(stats.Intercept, 2))
+            equation_text += '\nr = ' + str(round(stats.R, 2)) + ', p = ' + str(round(stats.P_value, 4))
             ax.text(x_text, y_text, equation_text, fontsize=10)
         self.number_row += 1
 
     def _title(self):
-        month = self.month_date.month
-        if month == 10:
-            month_name = 'Октябрь'
-        elif month == 11:
-            month_name = 'Ноябрь'
-        elif month == 12:
-            month_name = 'Декабрь'
-            
-        return month_name + ' 2021г, USA'
+        return get_month_name(self.month_date) + ', USA'
 
     def _xlabel(self, number_column):
         if number_column == 0:
@@ -261,35 +339,83 @@ class VaccinationFigure:
             return ''
 
     
-def analyze():
-    analyzed_months = [np.datetime64('2021-'+ month, 'D') for month in ('10', '11', '12')]
-    analyzotor = Analizator(analyzed_months)
-    analyzotor.analyze()  
-    print('Operation successfully completed!')
-        
-def build_window():       
-    window = QtWidgets.QWidget()
-    window.resize(600, 100)
+def plot_rolling(rolling):
+    #slope and correlation of the regressions over ROLLING_MONTHS months ending at every month
+    import seaborn as sns
+    from matplotlib import pyplot as plt
+    fig = plt.figure()
+    fig.suptitle('Регрессии по ' + str(ROLLING_MONTHS) + ' мес., USA', fontsize=14)
+    sns.set_style('darkgrid')
     
-    label = QtWidgets.QLabel()
-    label.setText('Анализ избыточной смертности в зависимости от доли невакцинированного населения в США')
+    slope_ax = fig.add_subplot(2, 1, 1)
+    slope_ax.set_ylabel('Наклон', fontsize=12)
+    r_ax = fig.add_subplot(2, 1, 2, sharex=slope_ax)
+    r_ax.set_ylabel('Коэффициент корреляции', fontsize=12)
+    
+    for age_group in AgeGroups:
+        for dose in ('First', 'Second'):
+            stats = rolling[(rolling.AgeGroup==age_group.name) & (rolling.Dose==dose)]
+            label = age_group.name + ', ' + dose
+            slope_ax.plot(stats.Month, stats.Slope, label=label)
+            if stats.Slope_Low.notnull().all():
+                slope_ax.fill_between(stats.Month, stats.Slope_Low, stats.Slope_High, alpha=0.15)
+            r_ax.plot(stats.Month, stats.R, label=label)
+    slope_ax.legend(fontsize=8)
+    fig.autofmt_xdate()
+    
+def get_analyzed_months():
+    return add_months(np.datetime64('2021-10'), np.arange(3))
+
+def analyze(progress=print, n_boot=Statistics.N_BOOT):
+    analyzotor = Analizator(get_analyzed_months())
+    return analyzotor.analyze(progress, n_boot)
+
+def series(progress=print, n_boot=Statistics.N_BOOT):
+    #regressions of every available month and rolling regressions over ROLLING_MONTHS months
+    analyzotor = Analizator()
+    tables = analyzotor.analyze(progress, n_boot)
+    progress('Counting of rolling regressions...')
+    tables['rolling'] = Statistics.rolling(tables['points'], ['AgeGroup', 'Dose'], 'Month', 'PartUnvaccined', 'K_Mortality', ROLLING_MONTHS, n_boot)
+    return tables
 
-    myFont=QtGui.QFont()
-    myFont.setPointSize(14)
-    myFont.setBold(True)
-    label.setFont(myFont)
+def sweep(progress=print, n_boot=Statistics.N_BOOT, quantity_processes=None):
+    analyzotor = Analizator(get_analyzed_months())
+    return {'sweep': Sweep.run(analyzotor, SWEEP_GRID, n_boot, quantity_processes, progress)}
 
-    button = QtWidgets.QCommandLinkButton("Analyze")
-    button.clicked.connect(analyze)
+def plot(tables):
+    if 'rolling' in tables:
+        plot_rolling(tables['rolling'])
+    if 'regression' not in tables:
+        return
+    points = tables['points']
+    bands = tables['bands']
+    for month, month_stats in tables['regression'].groupby('Month', sort=True):
+        figure = VaccinationFigure(np.datetime64(month, 'D'))
+        for age_group in AgeGroups:
+            panels = []
+            for dose in ('First', 'Second'):
+                stats = month_stats[(month_stats.AgeGroup==age_group.name) & (month_stats.Dose==dose)]
+                if stats.empty:
+                    #no states with data in the month, the row stays empty
+                    break
+                stats = stats.iloc[0]
+                data = points[(points.Month==month) & (points.AgeGroup==age_group.name) & (points.Dose==dose)]
+                band = bands[(bands.Month==month) & (bands.AgeGroup==age_group.name) & (bands.Dose==dose)]
+                panels.append((data.PartUnvaccined, data.K_Mortality, stats, band))
+            if len(panels) < 2:
+                figure.number_row += 1
+                continue
+            figure.add_scatters(panels)
     
-    vbox = QtWidgets.QVBoxLayout()
-    vbox.addWidget(label)
-    vbox.addWidget(button)
-    window.setLayout(vbox)
-    return window
+def split(tables):
+    #a figure for every month and one for rolling regressions
+    parts = []
+    for month in tables['regression'].Month.unique():
+        part = {name: tables[name][tables[name].Month==month] for name in ('regression', 'points', 'bands')}
+        parts.append((str(month)[:7], part))
+    if 'rolling' in tables:
+        parts.append(('rolling', {'rolling': tables['rolling']}))
+    return parts
     
 if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
-    window = build_window()    
-    window.show()
-    sys.exit(app.exec_())    
\ No newline at end of file
+    Application.run(TITLE, 'usa', analyze, plot, split, sweep, series)
@@ -0,0 +1,27 @@
+import pandas as pd
+import ExcessMortality
+from Regions import ROSSTAT_REGIONS
+
+
+def get_table_by_rows(excel, all_regions, all_mortality):
+    #the former row by row ExcessMortality.Excel._get_table
+    rows = []
+    for region, region_mortality in zip(all_regions, all_mortality):
+        region = ROSSTAT_REGIONS.get(region)
+        if not ROSSTAT_REGIONS.is_valid(region) or not region_mortality:
+            continue
+        rows.append((excel._get_year(), excel._get_month(), region, int(float(region_mortality))))
+    return pd.DataFrame(rows, columns=['Year', 'Month', 'Region', 'Mortality'])
+
+
+def test_table_repeats_rows():
+    #cells of xls are floats or '', cells of xlsx are strings or ''
+    regions = ['Российская Федерация', 'Центральный федеральный округ', 'Белгородская область1)', 'г. Москва', '',
+               'Тюменская область без автономии', 'Ханты-Мансийский авт.округ', 'Республика Северная Осетия-Алания', 'Курская область']
+    mortality = [150000.0, '40000', '2103', 12000.0, '', '1500', '800', '', 0]
+    excel = ExcessMortality.Excel('/tmp/edn2021/edn03_2021.xlsx')
+    
+    table = excel._get_table(regions, mortality)
+    assert list(table.Region) == ['Белгородская область', 'г. Москва']
+    assert list(table.dtypes.astype(str)) == ['int16', 'int8', 'object', 'uint32']
+    pd.testing.assert_frame_equal(table, get_table_by_rows(excel, regions, mortality), check_dtype=False)
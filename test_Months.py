@@ -0,0 +1,89 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from Months import add_months, split_months, get_months, get_month_range, get_month_name
+
+
+#month boundaries, leap days and dates before 1970, where the months are negative numbers
+DATES = ['1969-12-31', '1970-01-01', '1999-12-31', '2000-02-29', '2020-01-31', '2020-02-29', '2021-03-31', '2021-10-15', '2021-12-01']
+SHIFTS = [-25, -13, -12, -1, 0, 1, 11, 12, 13, 60]
+
+
+def get_random_dates(quantity=1000, seed=0):
+    generator = np.random.default_rng(seed)
+    return np.datetime64('1950-01-01') + generator.integers(0, 40000, quantity).astype('timedelta64[D]')
+
+
+@pytest.mark.parametrize('date', DATES)
+@pytest.mark.parametrize('shift', SHIFTS)
+def test_add_months_counts_years_and_months(date, shift):
+    date = datetime.date.fromisoformat(date)
+    months = 12 * date.year + date.month - 1 + shift
+    year, month = split_months(add_months(np.datetime64(date), shift))
+    assert (int(year), int(month)) == (months // 12, months % 12 + 1)
+
+
+@pytest.mark.parametrize('date', DATES)
+@pytest.mark.parametrize('shift', SHIFTS)
+def test_add_months_gives_first_days(date, shift):
+    result = add_months(np.datetime64(date), shift)
+    assert result.dtype == np.dtype('datetime64[D]')
+    assert result.astype(object).day == 1
+
+
+@pytest.mark.parametrize('first', SHIFTS)
+@pytest.mark.parametrize('second', SHIFTS)
+def test_add_months_is_additive(first, second):
+    dates = get_random_dates()
+    np.testing.assert_array_equal(add_months(add_months(dates, first), second), add_months(dates, first + second))
+
+
+@pytest.mark.parametrize('shift', SHIFTS)
+def test_add_months_round_trip(shift):
+    dates = get_random_dates()
+    np.testing.assert_array_equal(add_months(add_months(dates, shift), -shift), add_months(dates, 0))
+
+
+def test_add_months_agrees_with_dateutil():
+    relativedelta = pytest.importorskip('dateutil.relativedelta').relativedelta
+    dates = get_random_dates()
+    shifts = np.random.default_rng(1).integers(-60, 61, len(dates))
+    expected = [date.replace(day=1) + relativedelta(months=int(shift)) for date, shift in zip(dates.astype(object), shifts)]
+    assert list(add_months(dates, shifts).astype(object)) == expected
+
+
+def test_add_months_is_monotonic():
+    dates = np.sort(get_random_dates())
+    shifts = np.arange(-30, 31)
+    shifted = add_months(dates[:, None], shifts[None, :])
+    assert (np.diff(shifted, axis=1) > np.timedelta64(0, 'D')).all()
+    assert (np.diff(shifted, axis=0) >= np.timedelta64(0, 'D')).all()
+
+
+def test_add_months_accepts_dates_and_timestamps():
+    expected = np.datetime64('2022-01-01')
+    assert add_months(datetime.date(2021, 10, 26), 3) == expected
+    assert add_months(pd.Timestamp('2021-10-26'), 3) == expected
+    assert add_months(np.datetime64('2021-10-26T12:00'), 3) == expected
+
+
+def test_split_months_inverts_months():
+    dates = get_random_dates()
+    years, months = split_months(dates)
+    assert ((months >= 1) & (months <= 12)).all()
+    rebuilt = np.array([np.datetime64(str(year) + '-' + str(month).zfill(2)) for year, month in zip(years, months)])
+    np.testing.assert_array_equal(rebuilt, get_months(dates))
+
+
+@pytest.mark.parametrize('first, last', [('2020-12-31', '2021-01-01'), ('2021-01-15', '2021-01-20'), ('1969-11-02', '1971-03-04')])
+def test_get_month_range_is_consecutive(first, last):
+    months = get_month_range(np.datetime64(first), np.datetime64(last))
+    assert months[0] == add_months(np.datetime64(first), 0)
+    assert months[-1] == add_months(np.datetime64(last), 0)
+    np.testing.assert_array_equal(months, add_months(months[0], np.arange(len(months))))
+
+
+@pytest.mark.parametrize('date, name', [('2021-10-26', 'Октябрь 2021г'), ('2022-01-01', 'Январь 2022г'), ('1969-12-31', 'Декабрь 1969г')])
+def test_get_month_name(date, name):
+    assert get_month_name(np.datetime64(date)) == name
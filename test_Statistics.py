@@ -0,0 +1,112 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import linregress
+import Statistics
+from Months import add_months
+
+
+def get_points(quantity_groups=12, seed=0):
+    generator = np.random.default_rng(seed)
+    groups = []
+    for group in range(quantity_groups):
+        quantity = generator.integers(5, 60)
+        x = generator.random(quantity)
+        groups.append(pd.DataFrame({'Month': group // 4, 'Indicator': group % 4, 'X': x,
+                                    'Y': (group - 5) * 0.1 * x + generator.normal(0, 0.2, quantity)}))
+    return pd.concat(groups, ignore_index=True)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_regress_agrees_with_linregress(seed):
+    points = get_points(seed=seed)
+    stats, _ = Statistics.regress(points, ['Month', 'Indicator'], 'X', 'Y', 0)
+    for (month, indicator), group in points.groupby(['Month', 'Indicator']):
+        row = stats[(stats.Month == month) & (stats.Indicator == indicator)].iloc[0]
+        expected = linregress(group.X, group.Y)
+        assert row.N == len(group)
+        np.testing.assert_allclose([row.Slope, row.Intercept, row.R, row.P_value],
+                                   [expected.slope, expected.intercept, expected.rvalue, expected.pvalue], rtol=1e-9)
+
+
+def test_intervals_contain_estimates():
+    points = get_points()
+    stats, bands = Statistics.regress(points, ['Month', 'Indicator'], 'X', 'Y', 1000)
+    assert ((stats.Slope_Low <= stats.Slope) & (stats.Slope <= stats.Slope_High)).all()
+    assert ((stats.Intercept_Low <= stats.Intercept) & (stats.Intercept <= stats.Intercept_High)).all()
+    assert ((bands.Low <= bands.Y) & (bands.Y <= bands.High)).all()
+    assert len(bands) == len(stats) * Statistics.QUANTITY_BAND_POINTS
+
+
+def test_intervals_are_reproducible():
+    points = get_points()
+    first, _ = Statistics.regress(points, ['Month', 'Indicator'], 'X', 'Y', 200, seed=3)
+    second, _ = Statistics.regress(points, ['Month', 'Indicator'], 'X', 'Y', 200, seed=3)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_no_intervals_without_resamples():
+    stats, bands = Statistics.regress(get_points(), ['Month', 'Indicator'], 'X', 'Y', 0)
+    for column in ('Slope_Low', 'Slope_High', 'Intercept_Low', 'Intercept_High'):
+        assert stats[column].isnull().all()
+    assert bands.Low.isnull().all() and bands.High.isnull().all()
+    assert bands.Y.notnull().all()
+
+
+def test_degenerate_groups():
+    points = pd.concat([pd.DataFrame({'Group': 'one', 'X': [1.0], 'Y': [2.0]}),
+                        pd.DataFrame({'Group': 'two', 'X': [1.0, 2.0], 'Y': [2.0, 5.0]}),
+                        pd.DataFrame({'Group': 'constant', 'X': [3.0] * 4, 'Y': [1.0, 2.0, 3.0, 4.0]}),
+                        pd.DataFrame({'Group': 'usual', 'X': [1.0, 2.0, 3.0, 4.0], 'Y': [1.0, 2.5, 2.9, 4.2]})])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        stats, _ = Statistics.regress(points, ['Group'], 'X', 'Y', 100)
+    stats = stats.set_index('Group')
+    
+    #no line through one point or through points of one x
+    for group in ('one', 'constant'):
+        assert stats.loc[group, ['Slope', 'Intercept', 'R', 'P_value', 'Slope_Low', 'Slope_High']].isnull().all()
+    
+    #two points give the exact line, but no p-value
+    assert stats.loc['two', 'Slope'] == pytest.approx(3.0)
+    assert stats.loc['two', 'Intercept'] == pytest.approx(-1.0)
+    assert stats.loc['two', 'R'] == pytest.approx(1.0)
+    assert np.isnan(stats.loc['two', 'P_value'])
+    
+    #other groups are not spoiled by the degenerate ones
+    usual, _ = Statistics.regress(points[points.Group == 'usual'], ['Group'], 'X', 'Y', 0)
+    np.testing.assert_allclose(stats.loc['usual', ['Slope', 'Intercept', 'R', 'P_value']].astype(float),
+                               usual.iloc[0][['Slope', 'Intercept', 'R', 'P_value']].astype(float))
+
+
+def get_monthly_points(quantity_months=12, seed=0):
+    generator = np.random.default_rng(seed)
+    months = add_months(np.datetime64('2021-01-01'), np.arange(quantity_months))
+    groups = []
+    for number, month in enumerate(months):
+        for indicator in ('Vaccinated', 'FullyVaccinated'):
+            x = generator.random(30)
+            groups.append(pd.DataFrame({'Month': month, 'Indicator': indicator, 'X': x,
+                                        'Y': 0.05 * number * x + generator.normal(0, 0.2, 30)}))
+    return pd.concat(groups, ignore_index=True)
+
+
+@pytest.mark.parametrize('window', [1, 3, 12])
+def test_rolling_repeats_regressions_of_windows(window):
+    points = get_monthly_points()
+    months = np.sort(points.Month.unique())
+    rolling = Statistics.rolling(points, ['Indicator'], 'Month', 'X', 'Y', window)
+    assert len(rolling) == 2 * (len(months) - window + 1)
+    
+    for end in range(window - 1, len(months)):
+        window_points = points[points.Month.isin(months[end - window + 1: end + 1])]
+        expected, _ = Statistics.regress(window_points, ['Indicator'], 'X', 'Y', 0)
+        actual = rolling[rolling.Month == months[end]].drop('Month', axis=1).reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_rolling_needs_enough_periods():
+    points = get_monthly_points(quantity_months=2)
+    with pytest.raises(RuntimeError):
+        Statistics.rolling(points, ['Indicator'], 'Month', 'X', 'Y', 3)
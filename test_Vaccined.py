@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+import Vaccined
+from Regions import RegionNames
+from Benchmarks import get_synthetic_region, clear_duplicated_values_by_rows, delete_empty_rows_by_rows
+
+
+def clean_region(region_data):
+    downloader = Vaccined.VaccinationData.__new__(Vaccined.VaccinationData)
+    region_data = downloader._clear_duplicated_values(region_data)
+    return downloader._delete_empty_rows(region_data)
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('quantity_days', [1, 2, 50, 300])
+def test_row_cleaners_repeat_rows(seed, quantity_days):
+    region = get_synthetic_region(quantity_days, seed)
+    expected = delete_empty_rows_by_rows(clear_duplicated_values_by_rows(region.copy()))
+    pd.testing.assert_frame_equal(clean_region(region.copy()), expected)
+
+
+def test_row_cleaners_of_constant_region():
+    #only the oldest day of every counter stays
+    region = pd.DataFrame({'Date': np.arange(5, 0, -1, dtype='int32'), 'Vaccinated': np.full(5, 7, dtype='uint32'),
+                           'FullyVaccinated': np.full(5, 3, dtype='uint32'), 'Revaccinated': np.zeros(5, dtype='uint32')})
+    cleaned = clean_region(region)
+    assert list(cleaned.Date) == [1]
+    pd.testing.assert_frame_equal(cleaned, delete_empty_rows_by_rows(clear_duplicated_values_by_rows(region.copy())))
+
+
+def test_row_cleaners_of_empty_region():
+    region = get_synthetic_region(1).iloc[:0]
+    assert clean_region(region.copy()).empty
+
+
+def get_legacy_downloader(folder, data):
+    #vaccination_data.hdf as it was written before Region and Date became data columns
+    downloader = Vaccined.VaccinationData.__new__(Vaccined.VaccinationData)
+    downloader.table_name = 'data'
+    downloader.last_dates_name = 'last_dates'
+    downloader.data_columns = ['Region', 'Date']
+    downloader.file_name = str(folder / 'vaccination_data.hdf')
+    data.to_hdf(downloader.file_name, key=downloader.table_name, mode='a', complevel=4, append=True, format='table',
+                min_itemsize={'values': 50})
+    return downloader
+
+
+def test_where_read_of_legacy_table(tmp_path):
+    regions = []
+    for number, region in enumerate(['Москва', 'Тверская обл.', 'Ямало-Ненецкий АО']):
+        region_data = get_synthetic_region(100, number)
+        region_data['Date'] = Vaccined.datetime64_to_int(np.datetime64('2021-12-31') - np.arange(100))
+        region_data['Region'] = region
+        regions.append(region_data)
+    data = pd.concat(regions, ignore_index=True)
+    downloader = get_legacy_downloader(tmp_path, data)
+    downloader._write_last_dates({'Москва': 20211204})
+    with pytest.raises(ValueError):
+        Vaccined.VaccinationStore.read(downloader.file_name, downloader.table_name, 'Date >= 20211001')
+    
+    downloader._add_data_columns()
+    store = Vaccined.VaccinationStore.read(downloader.file_name, downloader.table_name, 'Date >= 20211001')
+    expected = Vaccined.VaccinationStore(data[data.Date >= 20211001])
+    assert store.regions == expected.regions
+    for column in expected.data:
+        np.testing.assert_array_equal(store.data[column], expected.data[column])
+    assert downloader._read_last_dates() == {'Москва': 20211204}
+    
+    #the rewritten table takes the rows of the next updates
+    downloader._add_data_columns()
+    data.iloc[:1].assign(Date=np.int32(20220105)).to_hdf(downloader.file_name, key=downloader.table_name, mode='a', append=True,
+                                               format='table', data_columns=downloader.data_columns, min_itemsize={'Region': 12})
+    assert len(Vaccined.VaccinationStore.read(downloader.file_name, downloader.table_name, 'Date == 20220105')) == 1
+
+
+def test_align_places_values_by_regions():
+    index = Vaccined.RegionIndex(['Москва', 'Тверская', 'Алтай'])
+    aligned = index.align(['Алтай', 'Неизвестная', 'Москва'], [3, 4, 1])
+    np.testing.assert_array_equal(aligned, [1, np.nan, 3])
+
+
+def test_align_rejects_repeated_regions():
+    index = Vaccined.RegionIndex(['Москва', 'Тверская'])
+    with pytest.raises(RuntimeError, match='Тверская'):
+        index.align(['Тверская', 'Москва', 'Тверская'], [1, 2, 3])
+
+
+def test_cached_tables_follow_region_names(tmp_path, monkeypatch):
+    monkeypatch.setattr(Vaccined, 'FOLDER', str(tmp_path) + '/')
+    names = ['Чувашская Республика', 'Тверская область', ' в том числе', 'Тюменская область без автономии']
+    pd.DataFrame({'Region': names, 'a': 0, 'b': 0, 'c': 0, 'd': 0, 'Mortality_2021': [3000, 2500, 2000, 4000],
+                  'Mortality_2020': [2000, 2000, 2000, 2000]}).to_csv(tmp_path / 'edn10_2021.csv', sep=';', index=False)
+    pd.DataFrame({'Region': names[:2] + ['Центральный федеральный округ'], 'Population': [1200000, 1250000, 39000000]}).to_csv(
+        tmp_path / 'Popul2021_Site-1.csv', sep=';', index=False)
+    
+    analyzator = Vaccined.Analyzator.__new__(Vaccined.Analyzator)
+    analyzator.file_cache = Vaccined.FileCache(str(tmp_path / 'cache'), Vaccined.PARSER_VERSION)
+    reader = Vaccined.MortalityReader(np.datetime64('2021-10-01', 'D'), analyzator.file_cache)
+    mortality = reader.read()
+    assert list(mortality.Region) == ['Чувашия', 'Тверская']
+    np.testing.assert_allclose(mortality.K_mortality, [1.5, 1.25])
+    assert list(analyzator._get_population().Region) == ['Тверская', 'Чувашия']
+    
+    #a new alias applies to the cached tables without changing PARSER_VERSION
+    monkeypatch.setattr(Vaccined, 'RUSSIAN_REGIONS', RegionNames(removed=r'Республика|область', aliases={'Чувашская': 'Чувашская Республика'}))
+    assert list(reader.read().Region) == ['Чувашская Республика', 'Тверская']
+    assert list(analyzator._get_population().Region) == ['Тверская', 'Чувашская Республика']
+    assert len(list((tmp_path / 'cache').iterdir())) == 2